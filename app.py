@@ -1,23 +1,43 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, session
+import time
+_IMPORT_STARTED = time.perf_counter()  # para el informe de tiempo de importación
+
+from flask import Flask, appcontext_pushed, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, send_file, session, make_response, g, has_request_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta, timezone
+from markupsafe import escape
+from jinja2 import FileSystemBytecodeCache
+from datetime import date, datetime, timedelta, timezone
 import calendar
+import csv
+import gc
+import hashlib
+import heapq
+import io
+import json
 import os
-import pandas as pd
 from werkzeug.utils import secure_filename
-import numpy as np
 import re
-import requests
-from docx import Document
-from docx.shared import Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.shared import OxmlElement, qn
-from sqlalchemy import text
+# numpy, requests, python-docx y openpyxl se importan dentro de las funciones que
+# los usan: cargarlos al arrancar retrasaba cada arranque en frío de Render
+from sqlalchemy import text, event, func, insert, tuple_, update, case
+from sqlalchemy.dialects import postgresql, sqlite
+from collections import OrderedDict, deque, namedtuple
+import atexit
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import base64
+import binascii
+import bisect
+import random
 import secrets
+import sys
+import tempfile
 import threading
-import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'tu_clave_secreta_aqui'
@@ -28,7 +48,8 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.static_folder = 'static'
 app.static_url_path = '/static'
 
-db = SQLAlchemy(app)
+# La base de datos se enlaza en create_app(), después de aplicar la configuración
+db = SQLAlchemy()
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -40,29 +61,68 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Caché de bytecode de Jinja en disco: las plantillas se compilan una vez (en el
+# build o en el primer arranque) y cada worker nuevo carga el código ya compilado
+# en lugar de volver a parsear plantillas de 50-100 KB. Jinja compara el checksum
+# del fuente, así que una plantilla modificada se recompila sola.
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR', os.path.join(app.root_path, '.jinja_cache'))
+try:
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    if not os.access(JINJA_CACHE_DIR, os.W_OK):
+        raise OSError('directorio sin permiso de escritura')
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+except OSError as e:
+    # Sin caché las plantillas se compilan en memoria como antes
+    print(f"⚠️  JINJA: Sin caché de bytecode en {JINJA_CACHE_DIR}: {e}")
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def parse_bool(value, default=False):
+    """Interpreta un booleano de JSON o de formulario ("false" es False); ValueError si no lo es"""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('1', 'true', 'yes', 'si', 'sí', 'on'):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError(f'Valor booleano no válido: {value!r}')
+
+def parse_id(value):
+    """Convierte un id recibido en JSON (entero o texto con dígitos) a int; None si no es válido"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
 def cleanup_expired_users():
-    """Elimina usuarios temporales que han expirado"""
+    """Elimina usuarios temporales que han expirado con un único DELETE"""
     with app.app_context():
-        expired_users = User.query.filter(
+        expired = db.select(User.id).where(
             User.is_temporary == True,
-            User.expires_at < datetime.now(timezone.utc)
-        ).all()
-        
-        for user in expired_users:
-            db.session.delete(user)
+            User.expires_at < to_naive_utc(datetime.now(timezone.utc))
+        )
+        detach_user_references(expired.scalar_subquery())
+        deleted = db.session.execute(db.delete(User).where(User.id.in_(expired.scalar_subquery()))).rowcount
+        db.session.commit()
         
-        if expired_users:
-            db.session.commit()
-            print(f"Eliminados {len(expired_users)} usuarios temporales expirados")
+        if deleted:
+            bump_version('user', 'task', 'activity_log')
+            invalidate_user_cache()
+            print(f"Eliminados {deleted} usuarios temporales expirados")
+        return deleted
 
 # Modelos
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
+    # 255: los hashes scrypt ocupan unos 160 caracteres
+    password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='user')
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     is_temporary = db.Column(db.Boolean, default=False)
@@ -71,6 +131,11 @@ class User(UserMixin, db.Model):
     login_token = db.Column(db.String(100), unique=True, nullable=True)
     login_token_used = db.Column(db.Boolean, default=False)
 
+    # Índice para buscar usuarios temporales por vencimiento
+    __table_args__ = (
+        db.Index('ix_user_temporary_expires', 'is_temporary', 'expires_at'),
+    )
+
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -90,7 +155,20 @@ class ActivityLog(db.Model):
     details = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
 
+    # Índices para recorrer la línea de tiempo en orden (created_at, id); no son de
+    # cobertura: las columnas restantes se leen de la tabla para cada fila de la página
+    __table_args__ = (
+        db.Index('ix_activity_log_created_id', 'created_at', 'id'),
+        db.Index('ix_activity_log_user_created_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_activity_log_task_created_id', 'task_id', 'created_at', 'id'),
+        db.Index('ix_activity_log_action_created_id', 'action', 'created_at', 'id'),
+    )
+
 class Planilla(db.Model):
+    __table_args__ = (
+        db.Index('ix_planilla_año_mes', 'año', 'mes'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     mes = db.Column(db.Integer, nullable=False)  # 1-12 para los meses
     año = db.Column(db.Integer, nullable=False)
@@ -108,13 +186,979 @@ class ImportantMessage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
 
+# Reglas de programación recurrente de limpieza
+class CleaningSchedule(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    area = db.Column(db.String(100), nullable=False)
+    title = db.Column(db.String(100), nullable=False)
+    frequency = db.Column(db.String(20), nullable=False)  # daily, weekly, monthly
+    interval = db.Column(db.Integer, default=1)  # cada N días / semanas / meses
+    weekdays = db.Column(db.String(20))  # semanal: días separados por coma, 0=lunes
+    weekday = db.Column(db.Integer)  # mensual: día de la semana, 0=lunes
+    nth = db.Column(db.Integer)  # mensual: 1-5, o -1 para el último
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date)
+    is_active = db.Column(db.Boolean, default=True)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+
+# Próxima ejecución de cada tarea del líder, para que un líder nuevo no las repita
+class SchedulerJob(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    next_run_at = db.Column(db.Float, nullable=False)  # segundos desde epoch (UTC)
+
+# Contadores compartidos del limitador de intentos (backend 'database')
+class RateLimitCounter(db.Model):
+    key = db.Column(db.String(200), primary_key=True)
+    window_index = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    prev_count = db.Column(db.Integer, nullable=False, default=0)
+    expires_at = db.Column(db.Integer, nullable=False, index=True)
+
+# Ajustes globales de la aplicación (valor en JSON)
+class Setting(db.Model):
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+
+# === MÉTRICAS (formato de texto de Prometheus) ===
+# Cada hilo escribe en su propio fragmento (shard) sin tomar locks: con el GIL,
+# sumar en un dict del que solo escribe un hilo es seguro. /metrics suma los
+# fragmentos al leer y pliega los de hilos terminados en uno solo. Las métricas
+# son por proceso: cada worker de Gunicorn expone las suyas con su pid.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Sin token, /metrics solo es público en desarrollo local
+METRICS_PUBLIC = os.environ.get('FLASK_ENV') == 'development' or os.environ.get('DEBUG') == 'True'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class MetricsRegistry:
+    """Contadores, gauges e histogramas fragmentados por hilo"""
+
+    def __init__(self):
+        self._meta = {}
+        self.reset()
+
+    def reset(self):
+        """Descarta lo medido; un worker recién creado no hereda las cifras del maestro"""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = self._new_shard()
+
+    @staticmethod
+    def _new_shard():
+        return {'counter': {}, 'gauge': {}, 'histogram': {}}
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._new_shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def describe(self, name, kind, help_text, buckets=LATENCY_BUCKETS):
+        """Declara una métrica: kind es 'counter', 'gauge' o 'histogram'"""
+        self._meta[name] = (kind, help_text, buckets)
+
+    def inc(self, name, labels=(), value=1):
+        """Suma al contador o gauge; labels es una tupla de pares (nombre, valor)"""
+        values = self._shard()[self._meta[name][0]]
+        key = (name, labels)
+        values[key] = values.get(key, 0) + value
+
+    def dec(self, name, labels=(), value=1):
+        self.inc(name, labels, -value)
+
+    def observe(self, name, value, labels=()):
+        """Registra una observación en el histograma"""
+        histograms = self._shard()['histogram']
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [[0] * (len(self._meta[name][2]) + 1), 0.0]
+        entry[0][bisect.bisect_left(self._meta[name][2], value)] += 1
+        entry[1] += value
+
+    @staticmethod
+    def _merge(target, shard):
+        for kind in ('counter', 'gauge'):
+            values = target[kind]
+            for key, value in shard[kind].copy().items():
+                values[key] = values.get(key, 0) + value
+        histograms = target['histogram']
+        for key, (counts, total) in shard['histogram'].copy().items():
+            entry = histograms.get(key)
+            if entry is None:
+                entry = histograms[key] = [[0] * len(counts), 0.0]
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+
+    def collect(self):
+        """Suma de todos los fragmentos"""
+        total = self._new_shard()
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = alive
+            self._merge(total, self._retired)
+        for _, shard in alive:
+            self._merge(total, shard)
+        return total
+
+    def render(self, gauges=()):
+        """Texto de exposición; gauges son (nombre, ayuda, [(labels, valor)]) calculados al leer"""
+        total = self.collect()
+        series = {}
+        for kind in ('counter', 'gauge', 'histogram'):
+            for (name, labels), value in total[kind].items():
+                series.setdefault(name, []).append((labels, value))
+        
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(series.get(name, ()), key=lambda item: item[0]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+                    continue
+                counts, value_sum = value
+                cumulative = 0
+                for bound, count in zip(buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {value_sum}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        for name, help_text, values in gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in values:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+metrics = MetricsRegistry()
+metrics.describe('http_requests_total', 'counter', 'Peticiones HTTP atendidas por endpoint, método y código')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Latencia de las peticiones HTTP por endpoint')
+metrics.describe('http_requests_in_flight', 'gauge', 'Peticiones HTTP en curso')
+metrics.describe('outbound_requests_total', 'counter', 'Peticiones salientes por destino y resultado')
+metrics.describe('outbound_request_duration_seconds', 'histogram', 'Latencia de las peticiones salientes por destino')
+metrics.describe('cache_requests_total', 'counter', 'Consultas a las cachés en proceso (hit/miss)')
+metrics.describe('password_hash_queue_depth', 'gauge', 'Hashes de contraseña en curso o esperando un hueco del pool')
+metrics.describe('password_hash_rejected_total', 'counter', 'Hashes rechazados por pool saturado (respuesta 503)')
+
+_CACHE_LABELS = {}
+
+def count_cache(cache, hit):
+    """Cuenta un acierto o fallo de una caché en proceso"""
+    labels = _CACHE_LABELS.get((cache, hit))
+    if labels is None:
+        labels = _CACHE_LABELS[(cache, hit)] = (('cache', cache), ('result', 'hit' if hit else 'miss'))
+    metrics.inc('cache_requests_total', labels)
+
+def observe_outbound(target, started, outcome):
+    """Registra la latencia y el resultado de una petición saliente"""
+    metrics.observe('outbound_request_duration_seconds', time.perf_counter() - started, (('target', target),))
+    metrics.inc('outbound_requests_total', (('target', target), ('outcome', outcome)))
+
+@app.before_request
+def _metrics_request_started():
+    g._metrics_started = time.perf_counter()
+    metrics.inc('http_requests_in_flight')
+
+@app.after_request
+def _metrics_response_status(response):
+    g._metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def _metrics_request_finished(exc):
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    metrics.dec('http_requests_in_flight')
+    # Las rutas inexistentes se agrupan para no crear una serie por URL
+    endpoint = request.endpoint or 'unmatched'
+    status = g.pop('_metrics_status', 500)
+    metrics.observe('http_request_duration_seconds', elapsed, (('endpoint', endpoint),))
+    metrics.inc('http_requests_total', (('endpoint', endpoint), ('method', request.method), ('status', str(status))))
+
+# === VERSIONES DE TABLAS Y RESPUESTAS CONDICIONALES (ETag) ===
+# Cada tabla tiene un contador de cambios en la tabla table_version que se
+# incrementa al hacer commit. Está en la base de datos para que un cambio hecho
+# en un worker invalide las cachés de todos los demás. Los contadores se leen
+# con una sola consulta por petición; los endpoints JSON construyen su ETag a
+# partir de ellos y pueden responder 304 sin cargar los datos. _BOOT_ID separa
+# los ETag de cada proceso; cada worker genera el suyo al hacer fork.
+_BOOT_ID = secrets.token_hex(4)
+
+class TableVersion(db.Model):
+    """Contador de cambios de una tabla, compartido por todos los procesos"""
+    __tablename__ = 'table_version'
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+def seed_table_versions():
+    """Crea el contador de cada tabla que aún no lo tenga (lo llama init_db)"""
+    existing = set(db.session.execute(db.select(TableVersion.name)).scalars())
+    missing = [name for name in db.metadata.tables if name not in existing and name != 'table_version']
+    if missing:
+        db.session.execute(insert(TableVersion), [{'name': name, 'version': 0} for name in missing])
+        db.session.commit()
+
+def bump_version(*tables):
+    """Incrementa el contador de cambios de las tablas indicadas (en su propia transacción)"""
+    tables = sorted(set(tables) - {'table_version'})
+    if not tables:
+        return
+    with db.engine.begin() as conn:
+        updated = conn.execute(
+            update(TableVersion).where(TableVersion.name.in_(tables)).values(version=TableVersion.version + 1)
+        ).rowcount
+        if updated < len(tables):
+            # Tabla sin contador (base creada antes de table_version)
+            known = set(conn.execute(db.select(TableVersion.name).where(TableVersion.name.in_(tables))).scalars())
+            conn.execute(insert(TableVersion), [{'name': name, 'version': 1} for name in tables if name not in known])
+    # La petición actual debe ver sus propios cambios
+    if has_request_context():
+        g.pop('_table_versions', None)
+    if 'user' in tables:
+        _user_version['version'] = None
+
+def get_version(*tables):
+    """Devuelve una tupla con la versión actual de cada tabla"""
+    versions = g.get('_table_versions') if has_request_context() else None
+    if versions is None:
+        versions = dict(db.session.execute(db.select(TableVersion.name, TableVersion.version)).all())
+        if has_request_context():
+            g._table_versions = versions
+    return tuple(versions.get(table, 0) for table in tables)
+
+@event.listens_for(db.session, 'after_flush')
+def _track_changed_tables(session, flush_context):
+    changed = session.info.setdefault('changed_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            changed.add(table.name)
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_changed_tables(session):
+    changed = session.info.pop('changed_tables', None)
+    if changed:
+        bump_version(*changed)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changed_tables(session):
+    session.info.pop('changed_tables', None)
+
+def make_etag(*parts):
+    """Construye un ETag estable a partir de versiones u otros valores"""
+    raw = '|'.join([_BOOT_ID] + [repr(part) for part in parts])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+def not_modified(etag):
+    """Devuelve una respuesta 304 si el cliente ya tiene esta versión, o None"""
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+def with_etag(response, etag):
+    """Agrega el ETag y las cabeceras de revalidación a una respuesta"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# === CONFIGURACIÓN GLOBAL COMPARTIDA ===
+# Ajustes que antes vivían en la cookie de sesión de cada administrador. Se guardan
+# en la tabla Setting y cada proceso mantiene una copia en memoria, válida mientras
+# no cambie la versión de la tabla setting (get_version, como el resto de cachés).
+SETTINGS_DEFAULTS = {
+    'global_year': 2026,
+    'section_2025_enabled': True,
+    'section_2025_message': 'Sección temporalmente no disponible. Posible actualización de plataforma en curso. Por favor, contacte al administrador para más información.'
+}
+
+_settings_cache = {'version': None, 'values': dict(SETTINGS_DEFAULTS)}
+_settings_lock = threading.Lock()
+
+def get_settings():
+    """Devuelve todos los ajustes globales (valores por defecto + tabla Setting)"""
+    if has_request_context() and '_settings' in g:
+        return g._settings
+    
+    version = get_version('setting')
+    count_cache('settings', _settings_cache['version'] == version)
+    if _settings_cache['version'] != version:
+        values = dict(SETTINGS_DEFAULTS)
+        for key, value in db.session.execute(db.select(Setting.key, Setting.value)):
+            values[key] = json.loads(value)
+        with _settings_lock:
+            _settings_cache.update(version=version, values=values)
+    values = _settings_cache['values']
+    
+    if has_request_context():
+        g._settings = values
+    return values
+
+def get_setting(key):
+    """Devuelve un ajuste global"""
+    return get_settings()[key]
+
+def save_settings(**values):
+    """Guarda ajustes globales; el llamador hace el commit"""
+    now = datetime.now(timezone.utc)
+    for key, value in values.items():
+        if key not in SETTINGS_DEFAULTS:
+            raise KeyError(key)
+        encoded = json.dumps(value)
+        result = db.session.execute(
+            update(Setting)
+            .where(Setting.key == key)
+            .values(value=encoded, updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(Setting).values(key=key, value=encoded, updated_at=now))
+    
+    # Las sentencias UPDATE/INSERT no pasan por after_flush: se marca la tabla
+    # para que el commit incremente su versión en todos los procesos
+    db.session.info.setdefault('changed_tables', set()).add('setting')
+    if has_request_context():
+        g.pop('_settings', None)
+
+# === HASH DE CONTRASEÑAS EN UN POOL DE PROCESOS ===
+# pbkdf2 es costoso a propósito; se calcula fuera del proceso web para no
+# bloquear al resto de peticiones. Con PASSWORD_HASH_WORKERS=0 se calcula en línea.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+PASSWORD_HASH_SALT_LENGTH = int(os.environ.get('PASSWORD_HASH_SALT_LENGTH', 16))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+class PasswordHashBusy(Exception):
+    """El pool de hash está saturado"""
+
+_hash_pool = None
+_hash_pool_pid = None
+_hash_pool_lock = threading.Lock()
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+def _get_hash_pool():
+    global _hash_pool, _hash_pool_pid
+    # Cada worker de gunicorn necesita su propio pool (no se hereda tras el fork)
+    if _hash_pool is None or _hash_pool_pid != os.getpid():
+        with _hash_pool_lock:
+            if _hash_pool is None or _hash_pool_pid != os.getpid():
+                _hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+                _hash_pool_pid = os.getpid()
+    return _hash_pool
+
+def _acquire_hash_slot():
+    """Espera un hueco en el pool; cuenta la espera en la profundidad de la cola"""
+    metrics.inc('password_hash_queue_depth')
+    if not _hash_slots.acquire(timeout=PASSWORD_HASH_TIMEOUT):
+        metrics.dec('password_hash_queue_depth')
+        metrics.inc('password_hash_rejected_total')
+        raise PasswordHashBusy()
+
+def _release_hash_slot():
+    _hash_slots.release()
+    metrics.dec('password_hash_queue_depth')
+
+def _submit_hash_job(func, *args):
+    """Reserva un hueco por hash y envía el trabajo; el hueco se libera cuando el
+    proceso termina (aunque quien esperaba ya haya abandonado por timeout)"""
+    _acquire_hash_slot()
+    try:
+        future = _get_hash_pool().submit(func, *args)
+    except Exception:
+        _release_hash_slot()
+        raise
+    future.add_done_callback(lambda _: _release_hash_slot())
+    return future
+
+def _hash_result(future):
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FuturesTimeoutError:
+        # El pool no dio abasto: el cliente recibe 503 en lugar de un error 500
+        metrics.inc('password_hash_rejected_total')
+        raise PasswordHashBusy()
+
+def _run_hash_job(func, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return func(*args)
+    return _hash_result(_submit_hash_job(func, *args))
+
+def hash_password(password):
+    """Genera el hash de una contraseña con el costo configurado"""
+    return _run_hash_job(generate_password_hash, password, PASSWORD_HASH_METHOD, PASSWORD_HASH_SALT_LENGTH)
+
+def hash_passwords(passwords):
+    """Genera los hashes de varias contraseñas repartiéndolas entre los procesos del pool.
+    
+    Cada hash ocupa su propio hueco y el lote tiene como mucho PASSWORD_HASH_WORKERS
+    hashes en el pool a la vez: un login que llega durante una importación masiva
+    espera a lo sumo una ronda, no el lote entero.
+    """
+    if PASSWORD_HASH_WORKERS <= 0:
+        return [generate_password_hash(password, PASSWORD_HASH_METHOD, PASSWORD_HASH_SALT_LENGTH) for password in passwords]
+    results = []
+    in_flight = deque()
+    for password in passwords:
+        if len(in_flight) >= PASSWORD_HASH_WORKERS:
+            results.append(_hash_result(in_flight.popleft()))
+        in_flight.append(_submit_hash_job(generate_password_hash, password, PASSWORD_HASH_METHOD, PASSWORD_HASH_SALT_LENGTH))
+    results.extend(_hash_result(future) for future in in_flight)
+    return results
+
+def verify_password(password_hash, password):
+    """Verifica una contraseña contra su hash"""
+    if not password_hash or password is None:
+        return False
+    return _run_hash_job(check_password_hash, password_hash, password)
+
+_current_hash_params = None
+
+def _hash_params(password_hash):
+    """Separa un hash de werkzeug ('método$sal$hash') en (método, largo de la sal)"""
+    parts = password_hash.split('$')
+    if len(parts) != 3:
+        return None
+    return parts[0], len(parts[1])
+
+def password_needs_rehash(password_hash):
+    """Indica si el hash se generó con parámetros distintos a los actuales.
+    
+    El método configurado puede omitir parámetros ('pbkdf2', 'scrypt'); werkzeug
+    guarda en el hash el método completo con sus valores por defecto, así que se
+    compara contra el de un hash de referencia generado con la configuración actual.
+    """
+    global _current_hash_params
+    if _current_hash_params is None:
+        _current_hash_params = _hash_params(hash_password(''))
+    return _hash_params(password_hash) != _current_hash_params
+
+def upgrade_password_hash(user, password):
+    """Regenera el hash con los parámetros actuales tras un login exitoso"""
+    if not password_needs_rehash(user.password_hash):
+        return
+    try:
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️  No se pudo actualizar el hash de {user.username}: {e}")
+
+@app.errorhandler(PasswordHashBusy)
+def password_hash_busy(e):
+    message = 'El servidor está ocupado. Intente de nuevo en unos segundos.'
+    if request.is_json:
+        return jsonify({'error': message}), 503
+    flash(message, 'error')
+    if request.method == 'GET':
+        return redirect(request.path)
+    # Las vistas solo POST (p. ej. la carga masiva) no aceptan la redirección a sí mismas
+    referrer = request.referrer
+    if referrer and referrer.startswith(request.host_url):
+        return redirect(referrer)
+    return redirect(url_for('admin_panel') if current_user.is_authenticated and current_user.role == 'admin' else url_for('login'))
+
+# === LIMITADOR DE INTENTOS DE LOGIN ===
+# Ventana deslizante aproximada: se guarda el conteo de la ventana actual y el de
+# la anterior, y se pondera el anterior según lo que queda de ventana.
+LOGIN_RATE_LIMIT_WINDOW = int(os.environ.get('LOGIN_RATE_LIMIT_WINDOW', 300))
+LOGIN_RATE_LIMIT_PER_IP = int(os.environ.get('LOGIN_RATE_LIMIT_PER_IP', 30))
+LOGIN_RATE_LIMIT_PER_USER = int(os.environ.get('LOGIN_RATE_LIMIT_PER_USER', 10))
+# Límite amplio por cuenta desde cualquier IP: frena ataques distribuidos sin que
+# un tercero pueda bloquear la cuenta desde su propia IP
+LOGIN_RATE_LIMIT_PER_ACCOUNT = int(os.environ.get('LOGIN_RATE_LIMIT_PER_ACCOUNT', 100))
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+# Número de proxies delante de la app (Render agrega uno)
+PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 1 if os.environ.get('RENDER') else 0))
+
+def _sliding_window(entry, now, window):
+    """Devuelve (ventana actual, conteo actual, conteo anterior) a partir de lo guardado"""
+    current = int(now // window)
+    if entry is None or entry[0] < current - 1:
+        return current, 0, 0
+    if entry[0] == current - 1:
+        return current, 0, entry[1]
+    return current, entry[1], entry[2]
+
+def _estimate(count, prev_count, now, window):
+    elapsed = (now % window) / window
+    return prev_count * (1 - elapsed) + count
+
+class MemoryRateLimitBackend:
+    """Contadores en memoria del proceso; cada worker cuenta por separado"""
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self._state = {}  # key -> (ventana, conteo, conteo anterior, expira)
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        with self._lock:
+            current, count, prev_count = _sliding_window(self._state.get(key), now, window)
+            expires = (current + 2) * window
+            if _estimate(count, prev_count, now, window) >= limit:
+                self._state[key] = (current, count, prev_count, expires)
+                return False, int(window - now % window) + 1
+            self._state[key] = (current, count + 1, prev_count, expires)
+            if now - self._last_sweep > self.SWEEP_INTERVAL:
+                self._sweep(now)
+            return True, 0
+
+    def reset(self, key):
+        with self._lock:
+            self._state.pop(key, None)
+
+    def _sweep(self, now):
+        self._last_sweep = now
+        for key in [k for k, entry in self._state.items() if entry[3] < now]:
+            del self._state[key]
+
+class DatabaseRateLimitBackend:
+    """Contadores en la tabla rate_limit_counter, compartidos entre workers y nodos"""
+
+    SWEEP_INTERVAL = 300
+
+    def __init__(self):
+        self._last_sweep = time.time()
+
+    UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        current = int(now // window)
+        table = RateLimitCounter.__table__
+        with db.engine.begin() as conn:
+            upsert = self.UPSERT_DIALECTS.get(conn.dialect.name)
+            if upsert:
+                count, prev_count = self._upsert(conn, upsert, table, key, current, limit, window)
+                # count ya incluye este intento
+                allowed = _estimate(count - 1, prev_count, now, window) < limit
+            else:
+                allowed = self._locked_hit(conn, table, key, now, limit, window)
+            if now - self._last_sweep > self.SWEEP_INTERVAL:
+                self._last_sweep = now
+                conn.execute(db.delete(table).where(table.c.expires_at < now))
+        return (True, 0) if allowed else (False, int(window - now % window) + 1)
+
+    def _upsert(self, conn, upsert, table, key, current, limit, window):
+        """Incrementa el contador en una sola sentencia (INSERT ... ON CONFLICT DO UPDATE).
+        
+        En el SET las columnas tienen el valor anterior a la actualización. El conteo
+        se detiene en limit + 1: basta para seguir rechazando y no crece sin fin.
+        """
+        stmt = upsert(table).values(
+            key=key, window_index=current, count=1, prev_count=0, expires_at=(current + 2) * window
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                'prev_count': case(
+                    (table.c.window_index == current, table.c.prev_count),
+                    (table.c.window_index == current - 1, table.c.count),
+                    else_=0
+                ),
+                'count': case(
+                    (table.c.window_index != current, 1),
+                    (table.c.count <= limit, table.c.count + 1),
+                    else_=table.c.count
+                ),
+                'window_index': current,
+                'expires_at': (current + 2) * window
+            }
+        ).returning(table.c.count, table.c.prev_count)
+        return conn.execute(stmt).one()
+
+    def _locked_hit(self, conn, table, key, now, limit, window):
+        """Alternativa para motores sin ON CONFLICT: bloquea la fila mientras se actualiza"""
+        row = conn.execute(
+            db.select(table.c.window_index, table.c.count, table.c.prev_count)
+            .where(table.c.key == key).with_for_update()
+        ).first()
+        current, count, prev_count = _sliding_window(row, now, window)
+        allowed = _estimate(count, prev_count, now, window) < limit
+        values = {
+            'window_index': current,
+            'count': count + 1 if allowed else count,
+            'prev_count': prev_count,
+            'expires_at': (current + 2) * window
+        }
+        if row is None:
+            conn.execute(insert(table).values(key=key, **values))
+        else:
+            conn.execute(update(table).where(table.c.key == key).values(**values))
+        return allowed
+
+    def reset(self, key):
+        with db.engine.begin() as conn:
+            conn.execute(db.delete(RateLimitCounter.__table__).where(RateLimitCounter.key == key))
+
+RATE_LIMIT_BACKENDS = {
+    'memory': MemoryRateLimitBackend,
+    'database': DatabaseRateLimitBackend
+}
+
+rate_limiter = RATE_LIMIT_BACKENDS[RATE_LIMIT_BACKEND]()
+
+def client_ip():
+    """IP del cliente, tomando la que agregó nuestro proxy en X-Forwarded-For"""
+    route = request.access_route
+    if PROXY_COUNT and request.headers.get('X-Forwarded-For') and len(route) >= PROXY_COUNT:
+        return route[-PROXY_COUNT]
+    return request.remote_addr
+
+def check_login_rate_limit(scope, username=None):
+    """Cuenta un intento de login; devuelve los segundos de espera si se superó el límite"""
+    try:
+        allowed, retry_after = rate_limiter.hit(f'ip:{scope}:{client_ip()}', LOGIN_RATE_LIMIT_PER_IP, LOGIN_RATE_LIMIT_WINDOW)
+        if not allowed:
+            return retry_after
+        if username:
+            # El bloqueo fuerte es por (usuario, IP); el límite por cuenta es más amplio
+            for key, limit in _user_rate_limit_keys(username):
+                allowed, retry_after = rate_limiter.hit(key, limit, LOGIN_RATE_LIMIT_WINDOW)
+                if not allowed:
+                    return retry_after
+    except Exception as e:
+        # Si el backend falla no se bloquea el login
+        print(f"⚠️  RATE-LIMIT: Error en el backend: {e}")
+    return None
+
+def _user_rate_limit_keys(username):
+    # El nombre viene del formulario sin límite de largo: se usa su hash para que la
+    # clave quepa en RateLimitCounter.key (200) y el limitador no falle abierto
+    username = hashlib.sha256(username.lower().encode('utf-8')).hexdigest()[:32]
+    return [
+        (f'user:{username}:{client_ip()}', LOGIN_RATE_LIMIT_PER_USER),
+        (f'user:{username}', LOGIN_RATE_LIMIT_PER_ACCOUNT)
+    ]
+
+def reset_login_rate_limit(username):
+    try:
+        for key, _ in _user_rate_limit_keys(username):
+            rate_limiter.reset(key)
+    except Exception as e:
+        print(f"⚠️  RATE-LIMIT: Error en el backend: {e}")
+
+def rate_limited_response(template, retry_after):
+    log_activity('rate_limited', details=f'{request.path} ({client_ip()})')
+    flash(f'Demasiados intentos. Intente de nuevo en {retry_after} segundos.', 'error')
+    response = make_response(render_template(template), 429)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+# === VENCIMIENTO DE USUARIOS TEMPORALES ===
+# En lugar de revisar periódicamente, se mantiene un montículo con los próximos
+# vencimientos y el hilo duerme hasta el siguiente. Cada cierto tiempo se vuelve a
+# leer la base de datos por si otro worker creó usuarios temporales.
+EXPIRY_RESYNC_INTERVAL = int(os.environ.get('EXPIRY_RESYNC_INTERVAL', 3600))
+
+def detach_user_references(user_ids_query):
+    """Quita las referencias a los usuarios antes de borrarlos (evita errores de clave foránea)"""
+    db.session.execute(update(ActivityLog).where(ActivityLog.user_id.in_(user_ids_query)).values(user_id=None))
+    db.session.execute(update(Task).where(Task.assigned_to.in_(user_ids_query)).values(assigned_to=None))
+
+class ExpiryScheduler:
+    """Hilo que borra los usuarios temporales justo cuando vencen"""
+
+    def __init__(self, resync_interval):
+        self.resync_interval = resync_interval
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._next_resync = 0
+        # Con el planificador de fondo solo el proceso líder ejecuta este hilo
+        self.autostart = True
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def schedule(self, expires_at, user_id):
+        """Agrega un vencimiento y despierta al hilo si es el más próximo"""
+        if not self.autostart and not self.is_running():
+            # Otro worker es el líder; lo recogerá en su próxima sincronización
+            return
+        with self._cond:
+            heapq.heappush(self._heap, (to_naive_utc(expires_at), user_id))
+            self._cond.notify()
+        self.start()
+
+    def start(self):
+        if self.is_running():
+            return
+        with self._cond:
+            if self.is_running():
+                return
+            self._pid = os.getpid()
+            self._next_resync = 0
+            self._thread = threading.Thread(target=self._run, name='expiry-scheduler', daemon=True)
+            self._thread.start()
+
+    def _resync(self):
+        """Borra lo vencido y recarga los próximos vencimientos desde la base de datos"""
+        cleanup_expired_users()
+        with app.app_context():
+            upcoming = db.session.query(User.expires_at, User.id).filter(
+                User.is_temporary == True,
+                User.expires_at != None
+            ).all()
+        with self._cond:
+            self._heap = [(to_naive_utc(expires_at), user_id) for expires_at, user_id in upcoming]
+            heapq.heapify(self._heap)
+
+    def request_resync(self):
+        """Pide al hilo que vuelva a leer la base de datos cuanto antes"""
+        with self._cond:
+            self._next_resync = 0
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            try:
+                if time.monotonic() >= self._next_resync:
+                    self._resync()
+                    self._next_resync = time.monotonic() + self.resync_interval
+                
+                with self._cond:
+                    now = to_naive_utc(datetime.now(timezone.utc))
+                    timeout = max(self._next_resync - time.monotonic(), 0)
+                    if self._heap:
+                        timeout = min(timeout, max((self._heap[0][0] - now).total_seconds(), 0))
+                    if timeout > 0:
+                        self._cond.wait(timeout)
+                    
+                    now = to_naive_utc(datetime.now(timezone.utc))
+                    due = False
+                    while self._heap and self._heap[0][0] <= now:
+                        heapq.heappop(self._heap)
+                        due = True
+                if due:
+                    cleanup_expired_users()
+            except Exception as e:
+                print(f"❌ EXPIRY: Error al eliminar usuarios temporales: {e}")
+                time.sleep(60)
+
+expiry_scheduler = ExpiryScheduler(EXPIRY_RESYNC_INTERVAL)
+
+# === REGISTRO DE ACTIVIDAD EN SEGUNDO PLANO ===
+ACTIVITY_LOG_QUEUE_SIZE = int(os.environ.get('ACTIVITY_LOG_QUEUE_SIZE', 10000))
+ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', 200))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', 2))
+ACTIVITY_LOG_MAX_ATTEMPTS = int(os.environ.get('ACTIVITY_LOG_MAX_ATTEMPTS', 3))
+
+class ActivityLogWriter:
+    """Encola eventos de actividad en memoria y los inserta por lotes desde un hilo"""
+
+    def __init__(self, max_queue, batch_size, flush_interval, max_attempts):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def log(self, action, user_id=None, task_id=None, details=None):
+        """Encola un evento; devuelve False si la cola está llena y se descarta"""
+        entry = {
+            'action': action,
+            'user_id': user_id,
+            'task_id': task_id,
+            'details': details,
+            'created_at': datetime.now(timezone.utc),
+            'attempts': 0
+        }
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return False
+            self._queue.append(entry)
+            pending = len(self._queue)
+        self._ensure_started()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def pending(self):
+        return len(self._queue)
+
+    def flush(self):
+        """Escribe todo lo que haya en la cola, en lotes de batch_size"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    count = min(len(self._queue), self.batch_size)
+                    batch = [self._queue.popleft() for _ in range(count)]
+                if not batch:
+                    return
+                with app.app_context():
+                    try:
+                        db.session.execute(insert(ActivityLog), self._rows(batch))
+                        db.session.commit()
+                        bump_version('activity_log')
+                    except Exception as e:
+                        db.session.rollback()
+                        self._retry_later(batch, e)
+                        return
+                self.written += len(batch)
+
+    def _rows(self, batch):
+        """Filas a insertar; las referencias a usuarios o tareas ya eliminados quedan en NULL"""
+        user_ids = {entry['user_id'] for entry in batch if entry['user_id'] is not None}
+        task_ids = {entry['task_id'] for entry in batch if entry['task_id'] is not None}
+        existing_users = set(db.session.execute(db.select(User.id).where(User.id.in_(user_ids))).scalars()) if user_ids else set()
+        existing_tasks = set(db.session.execute(db.select(Task.id).where(Task.id.in_(task_ids))).scalars()) if task_ids else set()
+        return [{
+            'action': entry['action'],
+            'user_id': entry['user_id'] if entry['user_id'] in existing_users else None,
+            'task_id': entry['task_id'] if entry['task_id'] in existing_tasks else None,
+            'details': entry['details'],
+            'created_at': entry['created_at']
+        } for entry in batch]
+
+    def _retry_later(self, batch, error):
+        """Devuelve el lote al principio de la cola; tras max_attempts intentos se descarta"""
+        retry = []
+        for entry in batch:
+            entry['attempts'] += 1
+            if entry['attempts'] < self.max_attempts:
+                retry.append(entry)
+        discarded = len(batch) - len(retry)
+        with self._lock:
+            self._queue.extendleft(reversed(retry))
+        self.failed += discarded
+        print(f"❌ ACTIVITY-LOG: Error al guardar {len(batch)} eventos ({len(retry)} se reintentarán, {discarded} descartados): {error}")
+
+    def _ensure_started(self):
+        # Tras un fork (workers de gunicorn) el hilo del proceso padre no existe
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+activity_log_writer = ActivityLogWriter(ACTIVITY_LOG_QUEUE_SIZE, ACTIVITY_LOG_BATCH_SIZE, ACTIVITY_LOG_FLUSH_INTERVAL, ACTIVITY_LOG_MAX_ATTEMPTS)
+atexit.register(activity_log_writer.flush)
+
+def log_activity(action, details=None, task_id=None, user_id=None):
+    """Registra una acción del usuario actual sin bloquear la petición"""
+    if user_id is None and current_user and current_user.is_authenticated:
+        user_id = current_user.id
+    return activity_log_writer.log(action, user_id=user_id, task_id=task_id, details=details)
+
+# === CACHÉ DE IDENTIDAD PARA FLASK-LOGIN ===
+# load_user se ejecuta en cada petición autenticada. Se guarda una copia inmutable
+# con los campos que usan las vistas y se invalida al editar o eliminar usuarios.
+# Los cambios hechos por otro worker se detectan con la versión de la tabla user,
+# que se consulta como mucho cada USER_VERSION_CHECK_INTERVAL segundos por proceso.
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30))
+USER_VERSION_CHECK_INTERVAL = float(os.environ.get('USER_VERSION_CHECK_INTERVAL', 5))
+
+class UserSnapshot(UserMixin, namedtuple('UserSnapshotBase', 'id username role is_temporary expires_at')):
+    """Copia de solo lectura de un usuario (no incluye el hash de la contraseña)"""
+    __slots__ = ()
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.role, bool(user.is_temporary), to_naive_utc(user.expires_at))
+
+    @property
+    def is_expired(self):
+        return bool(self.is_temporary and self.expires_at and self.expires_at < to_naive_utc(datetime.now(timezone.utc)))
+
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+_user_version = {'version': None, 'checked': 0.0}
+
+def recent_user_version(now):
+    """Versión de la tabla user; reutiliza la última lectura si es reciente"""
+    if has_request_context() and '_table_versions' in g:
+        version = get_version('user')
+    elif _user_version['version'] is not None and now - _user_version['checked'] < USER_VERSION_CHECK_INTERVAL:
+        return _user_version['version']
+    else:
+        version = get_version('user')
+    _user_version.update(version=version, checked=now)
+    return version
+
+def invalidate_user_cache(*user_ids):
+    """Elimina de la caché los usuarios indicados (o todos si no se indica ninguno)"""
+    with _user_cache_lock:
+        if not user_ids:
+            _user_cache.clear()
+        for user_id in user_ids:
+            _user_cache.pop(user_id, None)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    now = time.monotonic()
+    # Un cambio en la tabla user hecho por otro worker también invalida la copia
+    version = recent_user_version(now)
+    cached = _user_cache.get(user_id)
+    hit = cached is not None and cached[2] == version and now - cached[1] < USER_CACHE_TTL
+    count_cache('user', hit)
+    if hit:
+        snapshot = cached[0]
+    else:
+        user = db.session.get(User, user_id)
+        if user is None:
+            invalidate_user_cache(user_id)
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        with _user_cache_lock:
+            _user_cache[user_id] = (snapshot, now, version)
+    # Un usuario temporal expirado deja de estar autenticado aunque aún no se haya borrado
+    if snapshot.is_expired:
+        return None
+    return snapshot
 
 def init_db():
     with app.app_context():
         db.create_all()
+        seed_table_versions()
         
         # Migración: agregar campos de usuario temporal si no existen
         try:
@@ -151,15 +1195,31 @@ def init_db():
                     conn.execute(text('ALTER TABLE user ADD COLUMN login_token_used BOOLEAN DEFAULT FALSE'))
                     conn.commit()
                 print("Columna login_token_used agregada")
+            
+            # Ampliar password_hash (antes VARCHAR(120)); SQLite no limita el largo
+            password_hash_column = next(col for col in inspector.get_columns('user') if col['name'] == 'password_hash')
+            if db.engine.dialect.name == 'postgresql' and (getattr(password_hash_column['type'], 'length', None) or 255) < 255:
+                with db.engine.connect() as conn:
+                    conn.execute(text('ALTER TABLE "user" ALTER COLUMN password_hash TYPE VARCHAR(255)'))
+                    conn.commit()
+                print("Columna password_hash ampliada a 255 caracteres")
                 
         except Exception as e:
             print(f"Error en migración: {e}")
         
+        # Migración: crear índices nuevos en tablas que ya existían
+        try:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"Error creando índices: {e}")
+        
         # Crear usuario admin por defecto si no existe
         if not User.query.filter_by(username='admin').first():
             admin_user = User(
                 username='admin',
-                password_hash=generate_password_hash('admin123'),
+                password_hash=generate_password_hash('admin123', PASSWORD_HASH_METHOD, PASSWORD_HASH_SALT_LENGTH),
                 role='admin'
             )
             db.session.add(admin_user)
@@ -170,7 +1230,7 @@ def init_db():
         if not User.query.filter_by(username='root').first():
             root_user = User(
                 username='root',
-                password_hash=generate_password_hash('aseo2025slclabor'),
+                password_hash=generate_password_hash('aseo2025slclabor', PASSWORD_HASH_METHOD, PASSWORD_HASH_SALT_LENGTH),
                 role='admin'
             )
             db.session.add(root_user)
@@ -178,7 +1238,7 @@ def init_db():
         if not User.query.filter_by(username='julio').first():
             julio_user = User(
                 username='julio',
-                password_hash=generate_password_hash('julio21200521A'),
+                password_hash=generate_password_hash('julio21200521A', PASSWORD_HASH_METHOD, PASSWORD_HASH_SALT_LENGTH),
                 role='user'
             )
             db.session.add(julio_user)
@@ -364,83 +1424,140 @@ def init_db():
             db.session.add(msg)
             db.session.commit()
 
+# === CACHÉ DE PÁGINAS ESTÁTICAS ===
+# Nombres de los meses en español
+NOMBRES_MESES = {
+    1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
+    5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
+    9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
+}
+
+# Tarjetas estándar para todos los meses
+TARJETAS_ESTANDAR = (
+    {
+        'titulo': 'Salud Casanare',
+        'descripcion': 'Servicios especializados de limpieza y desinfección para el sector salud',
+        'imagen': 'salud casanare.png',
+        'icono': 'fa-hospital'
+    },
+    {
+        'titulo': 'Laboratorio',
+        'descripcion': 'Mantenimiento y limpieza de áreas críticas y equipos especializados',
+        'imagen': 'laboratorio.jpg',
+        'icono': 'fa-flask'
+    }
+)
+
+# Planillas de Laboratorio 2025: enlaces fijos por mes
+LABORATORIO_2025_URLS = {
+    1: 'https://docs.google.com/spreadsheets/d/1dDlOInXVAW-3BeBe-_q8IePx0cM70nYk/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    2: 'https://docs.google.com/spreadsheets/d/1D1e_LlQCUz84yOH96oDFp1SHGZzTeDwi/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    3: 'https://docs.google.com/spreadsheets/d/1j45Vzid9SmBSpLD51Abtp_mMG-1zgmOb/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    4: 'https://docs.google.com/spreadsheets/d/1akbFfZqAs3eAlJ_TYesrrhM6XUN8FeXP/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    5: 'https://docs.google.com/spreadsheets/d/1_dOqGMcHK-J51C6R8zHLgjocQ-oETJAl/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    6: 'https://docs.google.com/spreadsheets/d/1282tMi37hKiyvm3nPvMs7yylBwWKryyF/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    7: 'https://docs.google.com/spreadsheets/d/1JnMj_t3idxzK2EMsVw0wJmEWt9Jf2MpK/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    8: 'https://docs.google.com/spreadsheets/d/1Fa8cKJzLVdX4VD9dynPDNnXhrMfVeNjl/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    9: 'https://docs.google.com/spreadsheets/d/1RLKSFFKISJMEL64Lh02SqYcSQsTr76Rh/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    10: 'https://docs.google.com/spreadsheets/d/1tLWPyRIJI4j78mD8Khu6u3T6aII2o49l/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    11: 'https://docs.google.com/spreadsheets/d/1oOPs3Q2Wk8a6ZDMXgqaS50meNoXgCRiy/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
+    12: 'https://docs.google.com/spreadsheets/d/1VGL3TSMjS7qh5aCxzFPjYZUkXAPPPGhU/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true'
+}
+
+# Imágenes de los meses en static/images/meses (se listan una sola vez)
+_month_manifest = None
+
+def get_month_manifest():
+    """Empareja las imágenes de la carpeta de meses con los nombres de los meses"""
+    global _month_manifest
+    if _month_manifest is None:
+        ruta_img = os.path.join(app.static_folder, 'images', 'meses')
+        imagenes = sorted(f for f in os.listdir(ruta_img) if f.lower().endswith(('.jpg','.jpeg','.png','.webp')))
+        _month_manifest = tuple(
+            {'nombre': NOMBRES_MESES[i + 1], 'archivo': img}
+            for i, img in enumerate(imagenes[:12])
+        )
+    return _month_manifest
+
+# Las páginas de meses solo muestran el nombre del usuario; se renderizan una vez
+# con esta marca y se sustituye el nombre real en cada petición.
+_USERNAME_SLOT = '@@page-cache-username@@'
+
+class _PageCacheUser:
+    username = _USERNAME_SLOT
+    is_authenticated = True
+
+PAGE_CACHE_USER_SLOT = _PageCacheUser()
+
+_page_cache = {}
+_page_cache_lock = threading.Lock()
+
+def get_cached_page(key, render):
+    """Devuelve el HTML cacheado para la clave o lo renderiza una sola vez"""
+    if app.debug:
+        return render()
+    html = _page_cache.get(key)
+    count_cache('page', html is not None)
+    if html is None:
+        html = render()
+        with _page_cache_lock:
+            _page_cache[key] = html
+    return html
+
+def fill_user_slot(html):
+    """Sustituye la marca del usuario por el nombre del usuario actual"""
+    return html.replace(_USERNAME_SLOT, str(escape(current_user.username)))
+
+def invalidate_page_cache(*names):
+    """Elimina las páginas cacheadas (todas, o solo las de las vistas indicadas)"""
+    with _page_cache_lock:
+        if not names:
+            _page_cache.clear()
+            return
+        for key in [k for k in _page_cache if k[0] in names]:
+            del _page_cache[key]
+
 @app.route('/')
 def index():
     if current_user.is_authenticated:
         return redirect(url_for('dashboard'))
     return redirect(url_for('login'))
 
-@app.route('/inicio')
-def inicio():
+def render_inicio_page():
     meses = []
-    nombres_meses = {
-        1: 'Enero',
-        2: 'Febrero',
-        3: 'Marzo',
-        4: 'Abril',
-        5: 'Mayo',
-        6: 'Junio',
-        7: 'Julio',
-        8: 'Agosto',
-        9: 'Septiembre',
-        10: 'Octubre',
-        11: 'Noviembre',
-        12: 'Diciembre'
-    }
     for mes in range(1, 13):
         meses.append({
             'numero': mes,
-            'nombre': nombres_meses[mes],
+            'nombre': NOMBRES_MESES[mes],
             'imagen': f'static/images/meses/{mes}.jpg'
         })
     return render_template('inicio.html', meses=meses)
 
+def render_mes_page(mes):
+    return render_template('mes.html', 
+                        mes=mes, 
+                        nombre_mes=NOMBRES_MESES[mes],
+                        tarjetas=TARJETAS_ESTANDAR,
+                        current_user=PAGE_CACHE_USER_SLOT)
+
+def render_mes_2026_page(mes, year_2026):
+    return render_template('mes_2026.html', 
+                        mes=mes, 
+                        nombre_mes=NOMBRES_MESES[mes],
+                        tarjetas=TARJETAS_ESTANDAR,
+                        year_2026=year_2026,
+                        current_user=PAGE_CACHE_USER_SLOT)
+
+@app.route('/inicio')
+def inicio():
+    return get_cached_page(('inicio',), render_inicio_page)
+
 @app.route('/mes/<int:mes>')
 @login_required
 def ver_mes(mes):
     if 1 <= mes <= 12:
-        # Nombres de los meses en español
-        nombres_meses = {
-            1: 'Enero',
-            2: 'Febrero',
-            3: 'Marzo',
-            4: 'Abril',
-            5: 'Mayo',
-            6: 'Junio',
-            7: 'Julio',
-            8: 'Agosto',
-            9: 'Septiembre',
-            10: 'Octubre',
-            11: 'Noviembre',
-            12: 'Diciembre'
-        }
-
-        # Tarjetas estándar para todos los meses
-        tarjetas_estandar = [
-            {
-                'titulo': 'Salud Casanare',
-                'descripcion': 'Servicios especializados de limpieza y desinfección para el sector salud',
-                'imagen': 'salud casanare.png',
-                'icono': 'fa-hospital'
-            },
-            {
-                'titulo': 'Laboratorio',
-                'descripcion': 'Mantenimiento y limpieza de áreas críticas y equipos especializados',
-                'imagen': 'laboratorio.jpg',
-                'icono': 'fa-flask'
-            }
-        ]
-        
-        # Crear la información del mes actual
-        mes_actual = {
-            'nombre': nombres_meses[mes],
-            'tarjetas': tarjetas_estandar
-        }
-        
-        return render_template('mes.html', 
-                            mes=mes, 
-                            nombre_mes=mes_actual['nombre'],
-                            tarjetas=mes_actual['tarjetas'])
+        html = get_cached_page(('mes', mes, current_user.role), lambda: render_mes_page(mes))
+        return fill_user_slot(html)
     return redirect(url_for('dashboard'))
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -451,12 +1568,22 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
+        
+        # Rechazar antes de consultar la base de datos o calcular el hash
+        retry_after = check_login_rate_limit('login', username)
+        if retry_after:
+            return rate_limited_response('login.html', retry_after)
+        
         user = User.query.filter_by(username=username).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user.password_hash, password):
+            upgrade_password_hash(user, password)
+            reset_login_rate_limit(username)
             login_user(user)
+            log_activity('login')
             return redirect(url_for('dashboard'))
         else:
+            log_activity('login_failed', details=f'Usuario: {username}')
             flash('Usuario o contraseña incorrectos', 'error')
     
     return render_template('login.html')
@@ -464,43 +1591,22 @@ def login():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Obtener nombres de los meses
-    nombres_meses = [
-        'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-        'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'
-    ]
-    # Listar imágenes reales en la carpeta
-    ruta_img = os.path.join(app.static_folder, 'images', 'meses')
-    imagenes = [f for f in os.listdir(ruta_img) if f.lower().endswith(('.jpg','.jpeg','.png','.webp'))]
-    imagenes.sort()  # Orden alfabético
-    # Emparejar imágenes con meses para 2025
-    meses = []
-    for i, img in enumerate(imagenes):
-        if i < len(nombres_meses):
-            meses.append({'nombre': nombres_meses[i], 'archivo': img})
-    # Emparejar imágenes con meses para 2026 (idéntico a 2025)
-    meses_2026 = []
-    for i, img in enumerate(imagenes):
-        if i < len(nombres_meses):
-            meses_2026.append({'nombre': nombres_meses[i], 'archivo': img})
+    # Imágenes de los meses (2026 usa las mismas que 2025)
+    meses = meses_2026 = get_month_manifest()
     # Obtener estadísticas
-    stats = {
-        'pending_tasks': Task.query.filter_by(status='pending').count(),
-        'completed_tasks': Task.query.filter_by(status='completed').count(),
-        'active_users': User.query.filter(User.role == 'user').count(),
-        'avg_completion_time': '24h'  # Esto debería calcularse basado en datos reales
-    }
+    stats = get_task_stats()
     # Obtener actividades recientes
     recent_activities = ActivityLog.query.order_by(ActivityLog.created_at.desc()).limit(3).all()
     # Obtener próximas tareas
     upcoming_tasks = Task.query.filter_by(status='pending').order_by(Task.scheduled_for.asc()).limit(3).all()
     
     # Año dinámico para la sección 2026 (puede ser configurable)
-    year_2026 = session.get('global_year', 2026)  # Usar el año de la sesión o 2026 por defecto
+    settings = get_settings()
+    year_2026 = settings['global_year']
 
     # Estado de la sección 2025
-    section_2025_enabled = session.get('section_2025_enabled', True)
-    section_2025_message = session.get('section_2025_message', 'Sección temporalmente no disponible. Posible actualización de plataforma en curso. Por favor, contacte al administrador para más información.')
+    section_2025_enabled = settings['section_2025_enabled']
+    section_2025_message = settings['section_2025_message']
 
     important_msg = ImportantMessage.query.first()
     return render_template('dashboard.html', 
@@ -521,21 +1627,307 @@ def logout():
     session.pop('admin_authenticated', None)
     session.pop('admin_login_time', None)
     
+    log_activity('logout')
     logout_user()
     flash('Has cerrado sesión exitosamente.', 'info')
     return redirect(url_for('login'))
 
 # API endpoints para actualizar datos en tiempo real
-@app.route('/api/stats')
-@login_required
-def get_stats():
+# Estadísticas del dashboard, cacheadas hasta que cambian las tablas task o user
+_stats_cache = {'version': None, 'data': None}
+_stats_lock = threading.Lock()
+
+def get_task_stats():
+    version = get_version('task', 'user')
+    count_cache('task_stats', _stats_cache['version'] == version)
+    if _stats_cache['version'] == version:
+        return _stats_cache['data']
     stats = {
         'pending_tasks': Task.query.filter_by(status='pending').count(),
         'completed_tasks': Task.query.filter_by(status='completed').count(),
         'active_users': User.query.filter(User.role == 'user').count(),
-        'avg_completion_time': '24h'
+        'avg_completion_time': '24h'  # Esto debería calcularse basado en datos reales
     }
-    return jsonify(stats)
+    with _stats_lock:
+        _stats_cache.update(version=version, data=stats)
+    return stats
+
+@app.route('/api/stats')
+@login_required
+def get_stats():
+    etag = make_etag('stats', get_version('task', 'user'))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    return with_etag(jsonify(get_task_stats()), etag)
+
+ACTIVITY_PAGE_SIZE = 20
+ACTIVITY_PAGE_MAX = 100
+
+# Los registros antiguos pueden no tener created_at: se listan al final (NULLS LAST)
+# ordenados por id, que nunca es NULL y desempata dentro de la misma fecha
+def encode_activity_cursor(activity):
+    created_at = activity.created_at.isoformat() if activity.created_at else ''
+    raw = f'{created_at}|{activity.id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_activity_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    created_at, activity_id = raw.rsplit('|', 1)
+    return (datetime.fromisoformat(created_at) if created_at else None), int(activity_id)
+
+def activity_page(query, cursor, limit):
+    """Devuelve hasta limit + 1 filas después del cursor en orden created_at DESC NULLS LAST, id DESC.
+    
+    Se consulta en dos tramos (con fecha y sin fecha) para que cada uno use el índice
+    (created_at, id) en cualquier base de datos.
+    """
+    rows = []
+    created_at, activity_id = cursor if cursor else (None, None)
+    if cursor is None or created_at is not None:
+        dated = query.filter(ActivityLog.created_at.isnot(None))
+        if cursor:
+            dated = dated.filter(tuple_(ActivityLog.created_at, ActivityLog.id) < tuple_(created_at, activity_id))
+        rows = dated.order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc()).limit(limit + 1).all()
+        activity_id = None
+    if len(rows) <= limit:
+        undated = query.filter(ActivityLog.created_at.is_(None))
+        if activity_id is not None:
+            undated = undated.filter(ActivityLog.id < activity_id)
+        rows += undated.order_by(ActivityLog.id.desc()).limit(limit + 1 - len(rows)).all()
+    return rows
+
+@app.route('/api/activity')
+@login_required
+def activity_timeline():
+    """Línea de tiempo de actividad con paginación por cursor (created_at, id)"""
+    try:
+        limit = min(max(int(request.args.get('limit', ACTIVITY_PAGE_SIZE)), 1), ACTIVITY_PAGE_MAX)
+        cursor = request.args.get('cursor')
+        
+        query = ActivityLog.query
+        
+        # Los usuarios normales solo ven su propia actividad
+        if current_user.role == 'admin':
+            user_id = request.args.get('user_id', type=int)
+        else:
+            user_id = current_user.id
+        if user_id is not None:
+            query = query.filter(ActivityLog.user_id == user_id)
+        
+        task_id = request.args.get('task_id', type=int)
+        if task_id is not None:
+            query = query.filter(ActivityLog.task_id == task_id)
+        
+        action = request.args.get('action')
+        if action:
+            query = query.filter(ActivityLog.action == action)
+        
+        rows = activity_page(query, decode_activity_cursor(cursor) if cursor else None, limit)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return jsonify({
+            'success': True,
+            'items': [{
+                'id': row.id,
+                'user_id': row.user_id,
+                'task_id': row.task_id,
+                'action': row.action,
+                'details': row.details,
+                'created_at': row.created_at.isoformat() if row.created_at else None
+            } for row in rows],
+            'next_cursor': encode_activity_cursor(rows[-1]) if has_more else None
+        })
+        
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return jsonify({'error': 'Parámetros de paginación no válidos'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error al obtener actividad: {str(e)}'}), 500
+
+# === API DE TAREAS POR LOTES ===
+TASK_BATCH_MAX = 500
+TASK_STATUSES = ('pending', 'in_progress', 'completed')
+
+# Transiciones de estado permitidas (solo hacia adelante)
+TASK_TRANSITIONS = {
+    'pending': ('in_progress', 'completed'),
+    'in_progress': ('completed',),
+    'completed': ()
+}
+
+def parse_datetime(value):
+    """Convierte una fecha ISO 8601 en datetime, o None si viene vacía"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+@app.route('/api/tasks/batch', methods=['POST'])
+@login_required
+def create_tasks_batch():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Acceso denegado. Solo los administradores pueden crear tareas.'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    items = data.get('tasks')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Debe enviar una lista de tareas'}), 400
+    if len(items) > TASK_BATCH_MAX:
+        return jsonify({'error': f'Máximo {TASK_BATCH_MAX} tareas por petición'}), 400
+    
+    try:
+        # Validar los usuarios asignados con una sola consulta; los ids se convierten
+        # a int antes (None si no son válidos, se informa por elemento)
+        assignees = [
+            parse_id(item.get('assigned_to')) if isinstance(item, dict) and item.get('assigned_to') not in (None, '') else None
+            for item in items
+        ]
+        assignee_ids = {assignee for assignee in assignees if assignee is not None}
+        existing_ids = set()
+        if assignee_ids:
+            existing_ids = {row.id for row in db.session.query(User.id).filter(User.id.in_(assignee_ids))}
+        
+        results = []
+        created = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results.append({'index': index, 'success': False, 'error': 'Formato no válido'})
+                continue
+            title = (item.get('title') or '').strip()
+            status = item.get('status', 'pending')
+            assigned_to = assignees[index]
+            if not title or len(title) > 100:
+                results.append({'index': index, 'success': False, 'error': 'Título requerido (máximo 100 caracteres)'})
+                continue
+            if status not in TASK_STATUSES:
+                results.append({'index': index, 'success': False, 'error': f'Estado no válido: {status}'})
+                continue
+            if assigned_to is None and item.get('assigned_to') not in (None, ''):
+                results.append({'index': index, 'success': False, 'error': 'Usuario asignado no válido'})
+                continue
+            if assigned_to is not None and assigned_to not in existing_ids:
+                results.append({'index': index, 'success': False, 'error': f'Usuario {assigned_to} no existe'})
+                continue
+            try:
+                scheduled_for = parse_datetime(item.get('scheduled_for'))
+            except (TypeError, ValueError):
+                results.append({'index': index, 'success': False, 'error': 'Fecha programada no válida'})
+                continue
+            
+            task = Task(
+                title=title,
+                description=item.get('description'),
+                status=status,
+                assigned_to=assigned_to,
+                created_by=current_user.id,
+                created_at=datetime.now(timezone.utc),
+                scheduled_for=scheduled_for,
+                completed_at=datetime.now(timezone.utc) if status == 'completed' else None
+            )
+            db.session.add(task)
+            created.append(task)
+            results.append({'index': index, 'success': True, 'task': task})
+        
+        # Una sola transacción para todo el lote
+        db.session.commit()
+        
+        for result in results:
+            task = result.pop('task', None)
+            if task is not None:
+                result['id'] = task.id
+        log_activity('create_tasks', details=f'{len(created)} tareas creadas')
+        
+        return jsonify({
+            'success': True,
+            'created': len(created),
+            'failed': len(results) - len(created),
+            'results': results
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al crear tareas: {str(e)}'}), 500
+
+@app.route('/api/tasks/status', methods=['POST'])
+@login_required
+def update_tasks_status():
+    """Cambia el estado de muchas tareas en una sola transacción"""
+    data = request.get_json(silent=True) or {}
+    
+    # Formato corto: {"ids": [...], "status": "completed"}
+    # Formato completo: {"updates": [{"id": 1, "status": "in_progress"}, ...]}
+    updates = data.get('updates')
+    if updates is None and isinstance(data.get('ids'), list):
+        updates = [{'id': task_id, 'status': data.get('status')} for task_id in data['ids']]
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'Debe enviar una lista de actualizaciones'}), 400
+    if len(updates) > TASK_BATCH_MAX:
+        return jsonify({'error': f'Máximo {TASK_BATCH_MAX} tareas por petición'}), 400
+    
+    # Los ids se validan y convierten antes de consultar (acepta 5 o "5")
+    parsed = []
+    for item in updates:
+        raw_id = item.get('id') if isinstance(item, dict) else None
+        new_status = item.get('status') if isinstance(item, dict) else None
+        parsed.append((raw_id, parse_id(raw_id), new_status))
+    
+    try:
+        ids = {task_id for _, task_id, _ in parsed if task_id is not None}
+        tasks = {task.id: task for task in Task.query.filter(Task.id.in_(ids)).all()} if ids else {}
+        now = datetime.now(timezone.utc)
+        
+        results = []
+        changes = []
+        for raw_id, task_id, new_status in parsed:
+            if task_id is None:
+                results.append({'id': raw_id, 'success': False, 'error': 'Id de tarea no válido'})
+                continue
+            task = tasks.get(task_id)
+            
+            if task is None:
+                results.append({'id': task_id, 'success': False, 'error': 'Tarea no encontrada'})
+                continue
+            # Los usuarios normales solo pueden mover sus propias tareas
+            if current_user.role != 'admin' and task.assigned_to != current_user.id:
+                results.append({'id': task_id, 'success': False, 'error': 'Acceso denegado'})
+                continue
+            if new_status not in TASK_STATUSES:
+                results.append({'id': task_id, 'success': False, 'error': f'Estado no válido: {new_status}'})
+                continue
+            if new_status == task.status:
+                results.append({'id': task_id, 'success': True, 'status': task.status, 'unchanged': True})
+                continue
+            if new_status not in TASK_TRANSITIONS.get(task.status or 'pending', ()):
+                results.append({'id': task_id, 'success': False, 'error': f'Transición no permitida: {task.status} -> {new_status}'})
+                continue
+            
+            task.status = new_status
+            if new_status == 'completed':
+                task.completed_at = now
+            changes.append((task.id, new_status))
+            results.append({
+                'id': task_id,
+                'success': True,
+                'status': new_status,
+                'completed_at': task.completed_at.isoformat() if task.completed_at else None
+            })
+        
+        db.session.commit()
+        # Solo se registra lo que realmente quedó guardado
+        for task_id, new_status in changes:
+            log_activity('task_status', task_id=task_id, details=new_status)
+        
+        return jsonify({
+            'success': True,
+            'updated': len(changes),
+            'failed': sum(1 for result in results if not result['success']),
+            'results': results
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al actualizar tareas: {str(e)}'}), 500
 
 @app.route('/imagenes/<path:filename>')
 def serve_images(filename):
@@ -545,9 +1937,8 @@ def serve_images(filename):
 @login_required
 def salud_casanare_google(mes):
     # Verificar si la sección 2025 está desactivada
-    section_2025_enabled = session.get('section_2025_enabled', True)
-    if not section_2025_enabled:
-        message = session.get('section_2025_message', 'Sección temporalmente no disponible. Posible actualización de plataforma en curso. Por favor, contacte al administrador para más información.')
+    if not get_setting('section_2025_enabled'):
+        message = get_setting('section_2025_message')
         flash(message, 'warning')
         return redirect(url_for('dashboard'))
     
@@ -579,9 +1970,8 @@ def salud_casanare_google(mes):
 @login_required
 def descargar_planilla(mes, formato):
     # Verificar si la sección 2025 está desactivada
-    section_2025_enabled = session.get('section_2025_enabled', True)
-    if not section_2025_enabled:
-        message = session.get('section_2025_message', 'Sección temporalmente no disponible. Posible actualización de plataforma en curso. Por favor, contacte al administrador para más información.')
+    if not get_setting('section_2025_enabled'):
+        message = get_setting('section_2025_message')
         flash(message, 'warning')
         return redirect(url_for('dashboard'))
     
@@ -612,11 +2002,12 @@ def descargar_planilla(mes, formato):
             return redirect(url_for('salud_casanare_google', mes=mes))
         
         file_id = match.group(1)
+        log_activity('download_planilla', details=f'{nombre_archivo} ({formato})')
         
         if formato == 'excel':
             # URL de descarga directa para Excel
             download_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=xlsx"
-            response = requests.get(download_url)
+            response = fetch_google_export(download_url)
             
             if response.status_code == 200:
                 import tempfile
@@ -639,7 +2030,7 @@ def descargar_planilla(mes, formato):
         elif formato == 'pdf':
             # URL de descarga directa para PDF
             download_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=pdf"
-            response = requests.get(download_url)
+            response = fetch_google_export(download_url)
             
             if response.status_code == 200:
                 import tempfile
@@ -664,7 +2055,7 @@ def descargar_planilla(mes, formato):
             try:
                 # Descargar como PDF desde Google Drive para mantener formato
                 pdf_download_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=pdf"
-                response = requests.get(pdf_download_url)
+                response = fetch_google_export(pdf_download_url)
                 
                 if response.status_code == 200:
                     import tempfile
@@ -772,15 +2163,20 @@ def get_2025_status():
         return jsonify({'error': 'Acceso denegado'}), 403
     
     try:
-        # Obtener estado desde la sesión
-        enabled = session.get('section_2025_enabled', True)  # Por defecto activada
-        message = session.get('section_2025_message', 'Sección temporalmente no disponible. Posible actualización de plataforma en curso. Por favor, contacte al administrador para más información.')
+        # Obtener estado desde la configuración global
+        enabled = get_setting('section_2025_enabled')
+        message = get_setting('section_2025_message')
         
-        return jsonify({
+        etag = make_etag('2025_status', enabled, message)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        return with_etag(jsonify({
             'success': True,
             'enabled': enabled,
             'message': message
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'error': f'Error al obtener estado: {str(e)}'}), 500
@@ -799,9 +2195,10 @@ def update_2025_status():
         if not message.strip():
             return jsonify({'error': 'El mensaje no puede estar vacío'}), 400
         
-        # Guardar en la sesión
-        session['section_2025_enabled'] = enabled
-        session['section_2025_message'] = message
+        # Guardar en la configuración global (visible para todos los usuarios)
+        save_settings(section_2025_enabled=bool(enabled), section_2025_message=message)
+        db.session.commit()
+        log_activity('update_2025_status', details=f'Activada: {enabled}')
         
         return jsonify({
             'success': True,
@@ -811,40 +2208,24 @@ def update_2025_status():
         })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Error al actualizar estado: {str(e)}'}), 500
 
 @app.route('/laboratorio_google/<int:mes>')
 @login_required
 def laboratorio_google(mes):
     # Verificar si la sección 2025 está desactivada
-    section_2025_enabled = session.get('section_2025_enabled', True)
-    if not section_2025_enabled:
-        message = session.get('section_2025_message', 'Sección temporalmente no disponible. Posible actualización de plataforma en curso. Por favor, contacte al administrador para más información.')
+    if not get_setting('section_2025_enabled'):
+        message = get_setting('section_2025_message')
         flash(message, 'warning')
         return redirect(url_for('dashboard'))
     
     # Obtener la planilla del mes específico
     planilla = Planilla.query.filter_by(mes=mes, año=2025).first()
     
-    # URLs específicas para cada mes
-    urls_especificas = {
-        1: 'https://docs.google.com/spreadsheets/d/1dDlOInXVAW-3BeBe-_q8IePx0cM70nYk/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        2: 'https://docs.google.com/spreadsheets/d/1D1e_LlQCUz84yOH96oDFp1SHGZzTeDwi/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        3: 'https://docs.google.com/spreadsheets/d/1j45Vzid9SmBSpLD51Abtp_mMG-1zgmOb/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        4: 'https://docs.google.com/spreadsheets/d/1akbFfZqAs3eAlJ_TYesrrhM6XUN8FeXP/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        5: 'https://docs.google.com/spreadsheets/d/1_dOqGMcHK-J51C6R8zHLgjocQ-oETJAl/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        6: 'https://docs.google.com/spreadsheets/d/1282tMi37hKiyvm3nPvMs7yylBwWKryyF/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        7: 'https://docs.google.com/spreadsheets/d/1JnMj_t3idxzK2EMsVw0wJmEWt9Jf2MpK/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        8: 'https://docs.google.com/spreadsheets/d/1Fa8cKJzLVdX4VD9dynPDNnXhrMfVeNjl/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        9: 'https://docs.google.com/spreadsheets/d/1RLKSFFKISJMEL64Lh02SqYcSQsTr76Rh/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        10: 'https://docs.google.com/spreadsheets/d/1tLWPyRIJI4j78mD8Khu6u3T6aII2o49l/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        11: 'https://docs.google.com/spreadsheets/d/1oOPs3Q2Wk8a6ZDMXgqaS50meNoXgCRiy/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true',
-        12: 'https://docs.google.com/spreadsheets/d/1VGL3TSMjS7qh5aCxzFPjYZUkXAPPPGhU/edit?usp=sharing&ouid=116069373546627717051&rtpof=true&sd=true'
-    }
-    
     # Si existe una URL específica para el mes, usarla
-    if mes in urls_especificas:
-        planilla.url_google_drive = urls_especificas[mes]
+    if mes in LABORATORIO_2025_URLS:
+        planilla.url_google_drive = LABORATORIO_2025_URLS[mes]
     
     nombres_meses = {
         1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
@@ -862,45 +2243,18 @@ def laboratorio_google(mes):
 @login_required
 def ver_mes_2026(mes):
     if 1 <= mes <= 12:
-        nombres_meses = {
-            1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
-            5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-            9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-        }
-        tarjetas_estandar = [
-            {
-                'titulo': 'Salud Casanare',
-                'descripcion': 'Servicios especializados de limpieza y desinfección para el sector salud',
-                'imagen': 'salud casanare.png',
-                'icono': 'fa-hospital'
-            },
-            {
-                'titulo': 'Laboratorio',
-                'descripcion': 'Mantenimiento y limpieza de áreas críticas y equipos especializados',
-                'imagen': 'laboratorio.jpg',
-                'icono': 'fa-flask'
-            }
-        ]
-        mes_actual = {
-            'nombre': nombres_meses[mes],
-            'tarjetas': tarjetas_estandar
-        }
-        
         # Obtener el año dinámico
-        year_2026 = session.get('global_year', 2026)
+        year_2026 = get_setting('global_year')
         
-        return render_template('mes_2026.html', 
-                            mes=mes, 
-                            nombre_mes=mes_actual['nombre'],
-                            tarjetas=mes_actual['tarjetas'],
-                            year_2026=year_2026)
+        html = get_cached_page(('mes_2026', mes, year_2026, current_user.role), lambda: render_mes_2026_page(mes, year_2026))
+        return fill_user_slot(html)
     return redirect(url_for('dashboard'))
 
 @app.route('/salud_casanare2026_google/<int:mes>')
 @login_required
 def salud_casanare2026_google(mes):
     # Obtener el año dinámico
-    year_2026 = session.get('global_year', 2026)
+    year_2026 = get_setting('global_year')
     
     # Obtener la planilla del mes específico para el año dinámico
     planilla = Planilla.query.filter_by(mes=mes, año=year_2026).first()
@@ -920,7 +2274,7 @@ def salud_casanare2026_google(mes):
 @login_required
 def laboratorio2026_google(mes):
     # Obtener el año dinámico
-    year_2026 = session.get('global_year', 2026)
+    year_2026 = get_setting('global_year')
     
     # Obtener la planilla del mes específico para el año dinámico
     planilla = Planilla.query.filter_by(mes=mes, año=year_2026).first()
@@ -936,6 +2290,219 @@ def laboratorio2026_google(mes):
                          mes_actual=mes,
                          year_2026=year_2026)
 
+# === PROGRAMACIÓN RECURRENTE DE LIMPIEZA ===
+SCHEDULE_FREQUENCIES = ('daily', 'weekly', 'monthly')
+SCHEDULE_MAX_WINDOW_DAYS = 366
+SCHEDULE_CACHE_SIZE = 4096
+
+# Expansiones cacheadas por (id, versión de la regla, inicio, fin)
+_schedule_cache = OrderedDict()
+_schedule_cache_lock = threading.Lock()
+
+def expand_schedule(rule, start, end):
+    """Devuelve las fechas en que ocurre la regla dentro de [start, end)"""
+    key = (rule.id, rule.version, start, end)
+    with _schedule_cache_lock:
+        cached = _schedule_cache.get(key)
+        if cached is not None:
+            _schedule_cache.move_to_end(key)
+            return cached
+    
+    lo = max(start, rule.start_date)
+    hi = min(end, rule.end_date + timedelta(days=1)) if rule.end_date else end
+    if lo >= hi:
+        return ()
+    
+    import numpy as np
+    
+    interval = max(rule.interval or 1, 1)
+    origin = np.datetime64(rule.start_date, 'D')
+    days = np.arange(np.datetime64(lo, 'D'), np.datetime64(hi, 'D'))
+    # El 1970-01-01 fue jueves: (días + 3) % 7 da 0=lunes ... 6=domingo
+    weekdays = (days.astype(np.int64) + 3) % 7
+    
+    if rule.frequency == 'daily':
+        mask = (days - origin).astype(np.int64) % interval == 0
+    elif rule.frequency == 'weekly':
+        allowed = [int(d) for d in (rule.weekdays or '').split(',') if d.strip()]
+        week_origin = origin - (origin.astype(np.int64) + 3) % 7
+        weeks = (days - week_origin).astype(np.int64) // 7
+        mask = np.isin(weekdays, allowed) & (weeks % interval == 0)
+    else:
+        months = days.astype('datetime64[M]')
+        day_of_month = (days - months.astype('datetime64[D]')).astype(np.int64) + 1
+        month_index = (months - origin.astype('datetime64[M]')).astype(np.int64)
+        mask = (weekdays == rule.weekday) & (month_index % interval == 0)
+        if rule.nth == -1:
+            days_in_month = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+            mask &= day_of_month + 7 > days_in_month
+        else:
+            mask &= (day_of_month - 1) // 7 + 1 == rule.nth
+    
+    occurrences = tuple(days[mask].astype(object))
+    with _schedule_cache_lock:
+        _schedule_cache[key] = occurrences
+        while len(_schedule_cache) > SCHEDULE_CACHE_SIZE:
+            _schedule_cache.popitem(last=False)
+    return occurrences
+
+def get_schedule_occurrences(start, end):
+    """Agrupa por fecha las ocurrencias de todas las reglas activas en [start, end)"""
+    rules = CleaningSchedule.query.filter(
+        CleaningSchedule.is_active == True,
+        CleaningSchedule.start_date < end,
+        db.or_(CleaningSchedule.end_date == None, CleaningSchedule.end_date >= start)
+    ).order_by(CleaningSchedule.area.asc()).all()
+    
+    by_day = {}
+    for rule in rules:
+        for day in expand_schedule(rule, start, end):
+            by_day.setdefault(day, []).append({
+                'schedule_id': rule.id,
+                'area': rule.area,
+                'title': rule.title
+            })
+    return by_day
+
+def apply_schedule_fields(rule, data):
+    """Valida y copia los campos de la regla; lanza ValueError si algo no es válido"""
+    if not isinstance(data, dict):
+        raise ValueError('El cuerpo debe ser un objeto JSON')
+    area = (data.get('area', rule.area) or '').strip()
+    title = (data.get('title', rule.title) or '').strip()
+    frequency = data.get('frequency', rule.frequency)
+    interval = parse_id(data.get('interval', rule.interval or 1))
+    if interval is None:
+        raise ValueError('El intervalo debe ser un número entero')
+    
+    if not area or not title:
+        raise ValueError('El área y el título son obligatorios')
+    if frequency not in SCHEDULE_FREQUENCIES:
+        raise ValueError(f'Frecuencia no válida: {frequency}')
+    if interval < 1:
+        raise ValueError('El intervalo debe ser mayor que cero')
+    
+    weekdays = data.get('weekdays', rule.weekdays)
+    if isinstance(weekdays, list):
+        weekdays = ','.join(str(int(d)) for d in weekdays)
+    weekday = data.get('weekday', rule.weekday)
+    nth = data.get('nth', rule.nth)
+    
+    if frequency == 'weekly':
+        days = [int(d) for d in (weekdays or '').split(',') if d.strip()]
+        if not days or any(d < 0 or d > 6 for d in days):
+            raise ValueError('Indique los días de la semana (0=lunes ... 6=domingo)')
+    if frequency == 'monthly':
+        if weekday is None or not 0 <= int(weekday) <= 6:
+            raise ValueError('Indique el día de la semana (0=lunes ... 6=domingo)')
+        if nth is None or int(nth) not in (1, 2, 3, 4, 5, -1):
+            raise ValueError('Indique la semana del mes (1-5, o -1 para la última)')
+    
+    start_date = data.get('start_date')
+    start_date = date.fromisoformat(start_date) if start_date else rule.start_date
+    if start_date is None:
+        raise ValueError('La fecha de inicio es obligatoria')
+    end_date = data.get('end_date', rule.end_date)
+    if isinstance(end_date, str):
+        end_date = date.fromisoformat(end_date) if end_date else None
+    if end_date and end_date < start_date:
+        raise ValueError('La fecha de fin no puede ser anterior a la de inicio')
+    
+    rule.area = area
+    rule.title = title
+    rule.frequency = frequency
+    rule.interval = interval
+    rule.weekdays = weekdays if frequency == 'weekly' else None
+    rule.weekday = int(weekday) if frequency == 'monthly' else None
+    rule.nth = int(nth) if frequency == 'monthly' else None
+    rule.start_date = start_date
+    rule.end_date = end_date
+    rule.is_active = parse_bool(data.get('is_active'), default=True if rule.is_active is None else rule.is_active)
+
+def schedule_to_dict(rule):
+    return {
+        'id': rule.id,
+        'area': rule.area,
+        'title': rule.title,
+        'frequency': rule.frequency,
+        'interval': rule.interval,
+        'weekdays': [int(d) for d in rule.weekdays.split(',')] if rule.weekdays else [],
+        'weekday': rule.weekday,
+        'nth': rule.nth,
+        'start_date': rule.start_date.isoformat() if rule.start_date else None,
+        'end_date': rule.end_date.isoformat() if rule.end_date else None,
+        'is_active': rule.is_active,
+        'version': rule.version
+    }
+
+@app.route('/api/schedules', methods=['GET', 'POST'])
+@login_required
+def schedules():
+    if request.method == 'GET':
+        rules = CleaningSchedule.query.order_by(CleaningSchedule.area.asc()).all()
+        return jsonify({'success': True, 'schedules': [schedule_to_dict(rule) for rule in rules]})
+    
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Acceso denegado. Solo los administradores pueden crear programaciones.'}), 403
+    
+    try:
+        rule = CleaningSchedule(created_by=current_user.id, version=1)
+        apply_schedule_fields(rule, request.get_json(silent=True))
+        db.session.add(rule)
+        db.session.commit()
+        log_activity('create_schedule', details=f'{rule.area}: {rule.title}')
+        return jsonify({'success': True, 'schedule': schedule_to_dict(rule)})
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/schedules/<int:schedule_id>', methods=['POST'])
+@login_required
+def update_schedule(schedule_id):
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Acceso denegado. Solo los administradores pueden modificar programaciones.'}), 403
+    
+    rule = CleaningSchedule.query.get_or_404(schedule_id)
+    try:
+        apply_schedule_fields(rule, request.get_json(silent=True))
+        # Cambiar la versión invalida las expansiones cacheadas de esta regla
+        rule.version = (rule.version or 1) + 1
+        db.session.commit()
+        log_activity('update_schedule', details=f'{rule.area}: {rule.title}')
+        return jsonify({'success': True, 'schedule': schedule_to_dict(rule)})
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/schedules/<int:schedule_id>/delete', methods=['POST'])
+@login_required
+def delete_schedule(schedule_id):
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Acceso denegado. Solo los administradores pueden eliminar programaciones.'}), 403
+    
+    rule = CleaningSchedule.query.get_or_404(schedule_id)
+    db.session.delete(rule)
+    db.session.commit()
+    log_activity('delete_schedule', details=f'{rule.area}: {rule.title}')
+    return jsonify({'success': True, 'message': 'Programación eliminada exitosamente.'})
+
+@app.route('/api/schedules/occurrences')
+@login_required
+def schedule_occurrences():
+    try:
+        start = date.fromisoformat(request.args['start'])
+        end = date.fromisoformat(request.args['end'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Indique start y end en formato AAAA-MM-DD'}), 400
+    if end <= start or (end - start).days > SCHEDULE_MAX_WINDOW_DAYS:
+        return jsonify({'error': f'Rango no válido (máximo {SCHEDULE_MAX_WINDOW_DAYS} días)'}), 400
+    
+    by_day = get_schedule_occurrences(start, end)
+    return jsonify({
+        'success': True,
+        'occurrences': {day.isoformat(): items for day, items in sorted(by_day.items())}
+    })
+
 @app.route('/programacion')
 @login_required
 def programacion():
@@ -944,14 +2511,10 @@ def programacion():
     current_month = current_date.month
     current_year = current_date.year
     
-    # Nombres de los meses en español
-    month_names = [
-        'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-        'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'
-    ]
-    
-    current_month_name = month_names[current_month - 1]
+    current_month_name = NOMBRES_MESES[current_month]
     
+    # La cuadrícula y las limpiezas programadas las arma el navegador
+    # (updateCalendar + /api/schedules/occurrences), también al cambiar de mes
     return render_template('programacion.html', 
                          current_month_name=current_month_name,
                          current_year=current_year)
@@ -981,54 +2544,286 @@ def check_admin_session():
     
     return False
 
+# === RESUMEN DEL PANEL DE ADMINISTRACIÓN ===
+# El panel se arma con dos consultas: una con todos los conteos y otra (UNION ALL)
+# con las listas. El resultado se cachea unos segundos y por versión de tablas.
+ADMIN_SNAPSHOT_TTL = float(os.environ.get('ADMIN_SNAPSHOT_TTL', 5))
+
+SnapshotUser = namedtuple('SnapshotUser', 'id username role created_at expires_at')
+SnapshotPlanilla = namedtuple('SnapshotPlanilla', 'id titulo mes año created_at')
+SnapshotTask = namedtuple('SnapshotTask', 'id title status assigned_to created_at')
+
+_admin_snapshot = {'key': None, 'at': 0, 'data': None}
+_admin_snapshot_lock = threading.Lock()
+
+def _typed_null(type_):
+    return db.cast(db.null(), type_)
+
+def build_admin_snapshot():
+    """Consulta los conteos y las listas del panel en dos viajes a la base de datos"""
+    now = to_naive_utc(datetime.now(timezone.utc))
+    
+    counts = db.session.execute(db.select(
+        db.select(func.count(User.id)).scalar_subquery().label('total_users'),
+        db.select(func.count(Planilla.id)).scalar_subquery().label('total_planillas'),
+        db.select(func.count(Task.id)).scalar_subquery().label('total_tasks'),
+        db.select(func.count(Task.id)).where(Task.status == 'completed').scalar_subquery().label('completed_tasks')
+    )).one()
+    
+    recent_users = db.select(
+        db.literal('recent_user').label('kind'), User.id.label('id'), User.username.label('label'),
+        User.role.label('extra'), User.created_at.label('created_at'), User.expires_at.label('expires_at'),
+        _typed_null(db.Integer).label('num1'), _typed_null(db.Integer).label('num2'),
+        func.row_number().over(order_by=User.created_at.desc()).label('pos')
+    ).order_by(User.created_at.desc()).limit(5)
+    temporary_users = db.select(
+        db.literal('temporary_user'), User.id, User.username, User.role, User.created_at, User.expires_at,
+        _typed_null(db.Integer), _typed_null(db.Integer),
+        func.row_number().over(order_by=User.expires_at.asc())
+    ).where(User.is_temporary == True, User.expires_at > now)
+    recent_planillas = db.select(
+        db.literal('planilla'), Planilla.id, Planilla.titulo, _typed_null(db.String), Planilla.created_at,
+        _typed_null(db.DateTime), Planilla.mes, Planilla.año,
+        func.row_number().over(order_by=Planilla.created_at.desc())
+    ).order_by(Planilla.created_at.desc()).limit(5)
+    recent_tasks = db.select(
+        db.literal('task'), Task.id, Task.title, Task.status, Task.created_at,
+        _typed_null(db.DateTime), Task.assigned_to, _typed_null(db.Integer),
+        func.row_number().over(order_by=Task.created_at.desc())
+    ).order_by(Task.created_at.desc()).limit(10)
+    
+    # Cada rama se envuelve en una subconsulta para poder usar ORDER BY/LIMIT. El
+    # UNION ALL no garantiza el orden de las filas: cada fila lleva su lista ('kind')
+    # y su posición dentro de ella ('pos'), y el orden final se pide explícitamente.
+    lists = db.union_all(*[
+        db.select(query.subquery()) for query in (recent_users, temporary_users, recent_planillas, recent_tasks)
+    ]).order_by(db.literal_column('kind'), db.literal_column('pos'))
+    
+    snapshot = {
+        'total_users': counts.total_users,
+        'total_planillas': counts.total_planillas,
+        'total_tasks': counts.total_tasks,
+        'completed_tasks': counts.completed_tasks,
+        'recent_users': [],
+        'active_temporary_users': [],
+        'recent_planillas': [],
+        'all_tasks': []
+    }
+    for kind, row_id, label, extra, created_at, expires_at, num1, num2, _ in db.session.execute(lists):
+        if kind == 'recent_user':
+            snapshot['recent_users'].append(SnapshotUser(row_id, label, extra, created_at, expires_at))
+        elif kind == 'temporary_user':
+            snapshot['active_temporary_users'].append(SnapshotUser(row_id, label, extra, created_at, expires_at))
+        elif kind == 'planilla':
+            snapshot['recent_planillas'].append(SnapshotPlanilla(row_id, label, num1, num2, created_at))
+        elif kind == 'task':
+            snapshot['all_tasks'].append(SnapshotTask(row_id, label, extra, num1, created_at))
+    return snapshot
+
+def get_admin_snapshot():
+    """Devuelve el resumen del panel, reutilizándolo durante ADMIN_SNAPSHOT_TTL segundos"""
+    key = get_version('user', 'planilla', 'task')
+    now = time.monotonic()
+    cached = _admin_snapshot
+    hit = cached['data'] is not None and cached['key'] == key and now - cached['at'] < ADMIN_SNAPSHOT_TTL
+    count_cache('admin_snapshot', hit)
+    if hit:
+        return cached['data']
+    data = build_admin_snapshot()
+    with _admin_snapshot_lock:
+        _admin_snapshot.update(key=key, at=now, data=data)
+    return data
+
+def admin_snapshot_to_json(snapshot):
+    def serialize(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+    
+    result = {}
+    for key, value in snapshot.items():
+        if isinstance(value, list):
+            result[key] = [{field: serialize(item) for field, item in row._asdict().items()} for row in value]
+        else:
+            result[key] = value
+    return result
+
 @app.route('/admin')
 @login_required
-def admin_panel():
+def admin_panel():
+    # Verificar si el usuario es administrador
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Acceso denegado. Solo los administradores pueden acceder a esta sección.'}), 403
+    
+    # Verificar si el usuario está autenticado como admin
+    if not check_admin_session():
+        return redirect(url_for('admin_login'))
+    
+    snapshot = get_admin_snapshot()
+    
+    # Obtener el año dinámico
+    year_2026 = get_setting('global_year')
+    
+    return render_template('admin.html', year_2026=year_2026, **snapshot)
+
+@app.route('/admin/snapshot')
+@login_required
+def admin_snapshot():
+    """Versión JSON del resumen del panel para refrescos por AJAX"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Acceso denegado. Solo los administradores pueden acceder a esta sección.'}), 403
+    if not check_admin_session():
+        return jsonify({'error': 'No autenticado como administrador'}), 401
+    
+    return jsonify({'success': True, **admin_snapshot_to_json(get_admin_snapshot())})
+
+# === ASIGNACIÓN BALANCEADA DE TAREAS ===
+ASSIGNMENT_MAX_TASKS = 10000
+
+def to_naive_utc(value):
+    """Normaliza un datetime a UTC sin zona horaria (como lo guarda la base de datos)"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def balance_assignments(tasks, crew, load, day_load):
+    """Reparte las tareas entre el personal con un montículo por día.
+
+    tasks: lista de (task_id, scheduled_for); crew: {user_id: expires_at o None};
+    load: {user_id: tareas abiertas}; day_load: {(user_id, 'AAAA-MM-DD'): tareas ese día}.
+    Cada tarea va al usuario con menos tareas ese día y, a igualdad, con menos
+    tareas en total. Devuelve una lista de (task_id, user_id o None).
+    """
+    total = {user_id: load.get(user_id, 0) for user_id in crew}
+    heaps = {}
+    assignments = []
+    
+    ordered = sorted(tasks, key=lambda item: (item[1] is None, item[1] or datetime.min, item[0]))
+    for task_id, scheduled_for in ordered:
+        scheduled_for = to_naive_utc(scheduled_for)
+        day = scheduled_for.date().isoformat() if scheduled_for else None
+        heap = heaps.get(day)
+        if heap is None:
+            heap = [(day_load.get((user_id, day), 0), total[user_id], user_id) for user_id in crew]
+            heapq.heapify(heap)
+            heaps[day] = heap
+        
+        chosen = None
+        skipped = []
+        while heap:
+            day_count, total_count, user_id = heapq.heappop(heap)
+            if total_count != total[user_id]:
+                # El total cambió por asignaciones de otro día: reinsertar actualizado
+                heapq.heappush(heap, (day_count, total[user_id], user_id))
+                continue
+            expires_at = to_naive_utc(crew[user_id])
+            if expires_at and scheduled_for and scheduled_for > expires_at:
+                # Usuario temporal que ya no estará disponible a esa hora
+                skipped.append((day_count, total_count, user_id))
+                continue
+            chosen = (day_count, user_id)
+            break
+        for item in skipped:
+            heapq.heappush(heap, item)
+        
+        if chosen is None:
+            assignments.append((task_id, None))
+            continue
+        day_count, user_id = chosen
+        total[user_id] += 1
+        heapq.heappush(heap, (day_count + 1, total[user_id], user_id))
+        assignments.append((task_id, user_id))
+    
+    return assignments
+
+@app.route('/admin/assign_tasks', methods=['POST'])
+@login_required
+def assign_tasks():
     # Verificar si el usuario es administrador
     if current_user.role != 'admin':
         return jsonify({'error': 'Acceso denegado. Solo los administradores pueden acceder a esta sección.'}), 403
     
     # Verificar si el usuario está autenticado como admin
     if not check_admin_session():
-        return redirect(url_for('admin_login'))
-    
-    # Limpiar usuarios expirados
-    cleanup_expired_users()
-    
-    # Obtener estadísticas del sistema
-    total_users = User.query.count()
-    total_planillas = Planilla.query.count()
-    total_tasks = Task.query.count()
-    completed_tasks = Task.query.filter_by(status='completed').count()
-    
-    # Obtener usuarios recientes
-    recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
-    
-    # Obtener usuarios temporales activos
-    active_temporary_users = User.query.filter(
-        User.is_temporary == True,
-        User.expires_at > datetime.now(timezone.utc)
-    ).order_by(User.expires_at.asc()).all()
-    
-    # Obtener planillas recientes
-    recent_planillas = Planilla.query.order_by(Planilla.created_at.desc()).limit(5).all()
+        return jsonify({'error': 'No autenticado como administrador'}), 401
     
-    # Obtener todas las tareas
-    all_tasks = Task.query.order_by(Task.created_at.desc()).limit(10).all()
+    data = request.get_json(silent=True) or {}
+    try:
+        dry_run = parse_bool(data.get('dry_run'), default=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Obtener el año dinámico
-    year_2026 = session.get('global_year', 2026)
-    
-    return render_template('admin.html',
-                         total_users=total_users,
-                         total_planillas=total_planillas,
-                         total_tasks=total_tasks,
-                         completed_tasks=completed_tasks,
-                         recent_users=recent_users,
-                         active_temporary_users=active_temporary_users,
-                         recent_planillas=recent_planillas,
-                         all_tasks=all_tasks,
-                         year_2026=year_2026)
+    try:
+        # Tareas sin asignar (todas, o solo las indicadas)
+        task_query = db.session.query(Task.id, Task.scheduled_for).filter(
+            Task.assigned_to == None,
+            Task.status != 'completed'
+        )
+        if data.get('task_ids'):
+            task_query = task_query.filter(Task.id.in_(data['task_ids']))
+        if data.get('start'):
+            task_query = task_query.filter(Task.scheduled_for >= parse_datetime(data['start']))
+        if data.get('end'):
+            task_query = task_query.filter(Task.scheduled_for < parse_datetime(data['end']))
+        tasks = task_query.limit(ASSIGNMENT_MAX_TASKS).all()
+        
+        # Personal disponible: usuarios normales y temporales no expirados
+        crew_query = db.session.query(User.id, User.username, User.expires_at).filter(
+            User.role == 'user',
+            db.or_(User.is_temporary == False, User.is_temporary == None, User.expires_at > datetime.now(timezone.utc))
+        )
+        if data.get('user_ids'):
+            crew_query = crew_query.filter(User.id.in_(data['user_ids']))
+        crew_rows = crew_query.all()
+        if not crew_rows:
+            return jsonify({'error': 'No hay personal disponible para asignar'}), 400
+        crew = {row.id: row.expires_at for row in crew_rows}
+        usernames = {row.id: row.username for row in crew_rows}
+        
+        # Carga actual: tareas abiertas por usuario y por usuario/día
+        open_tasks = db.session.query(Task.assigned_to, func.date(Task.scheduled_for), func.count(Task.id)).filter(
+            Task.status.in_(['pending', 'in_progress']),
+            Task.assigned_to.in_(list(crew))
+        ).group_by(Task.assigned_to, func.date(Task.scheduled_for)).all()
+        load = {}
+        day_load = {}
+        for user_id, day, count in open_tasks:
+            load[user_id] = load.get(user_id, 0) + count
+            if day is not None:
+                day_load[(user_id, str(day)[:10])] = count
+        
+        assignments = balance_assignments([(row.id, row.scheduled_for) for row in tasks], crew, load, day_load)
+        assigned = [(task_id, user_id) for task_id, user_id in assignments if user_id is not None]
+        
+        if not dry_run and assigned:
+            db.session.execute(update(Task), [{'id': task_id, 'assigned_to': user_id} for task_id, user_id in assigned])
+            db.session.commit()
+            bump_version('task')
+            log_activity('assign_tasks', details=f'{len(assigned)} tareas asignadas')
+        
+        final_load = dict(load)
+        for _, user_id in assigned:
+            final_load[user_id] = final_load.get(user_id, 0) + 1
+        
+        return jsonify({
+            'success': True,
+            'dry_run': dry_run,
+            'assigned': len(assigned),
+            'assignments': [{
+                'task_id': task_id,
+                'user_id': user_id,
+                'username': usernames.get(user_id)
+            } for task_id, user_id in assignments],
+            'unassigned': [task_id for task_id, user_id in assignments if user_id is None],
+            'load': {usernames[user_id]: final_load.get(user_id, 0) for user_id in crew}
+        })
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Parámetros no válidos: {str(e)}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al asignar tareas: {str(e)}'}), 500
+
+ADMIN_USERS_PER_PAGE = 50
+ADMIN_USERS_MAX_PER_PAGE = 200
 
 @app.route('/admin/users')
 @login_required
@@ -1041,8 +2836,47 @@ def admin_users():
     if not check_admin_session():
         return redirect(url_for('admin_login'))
     
-    users = User.query.all()
-    return render_template('admin_users.html', users=users)
+    # Filtros de búsqueda
+    filters = {
+        'q': request.args.get('q', '').strip(),
+        'role': request.args.get('role', ''),
+        'temporary': request.args.get('temporary', ''),
+        'expired': request.args.get('expired', '')
+    }
+    per_page = min(max(request.args.get('per_page', ADMIN_USERS_PER_PAGE, type=int), 1), ADMIN_USERS_MAX_PER_PAGE)
+    after = request.args.get('after', type=int)
+    
+    # Solo las columnas que muestra la tabla (sin hashes ni contraseñas temporales)
+    query = db.session.query(User.id, User.username, User.role, User.created_at, User.is_temporary, User.expires_at)
+    if filters['q']:
+        query = query.filter(User.username.icontains(filters['q'], autoescape=True))
+    if filters['role'] in ('admin', 'user'):
+        query = query.filter(User.role == filters['role'])
+    if filters['temporary'] == '1':
+        query = query.filter(User.is_temporary == True)
+    elif filters['temporary'] == '0':
+        query = query.filter(db.or_(User.is_temporary == False, User.is_temporary == None))
+    now = to_naive_utc(datetime.now(timezone.utc))
+    if filters['expired'] == '1':
+        query = query.filter(User.is_temporary == True, User.expires_at < now)
+    elif filters['expired'] == '0':
+        query = query.filter(db.or_(User.expires_at == None, User.expires_at >= now))
+    
+    # Paginación por cursor sobre el id
+    if after:
+        query = query.filter(User.id > after)
+    users = query.order_by(User.id.asc()).limit(per_page + 1).all()
+    next_after = users[per_page - 1].id if len(users) > per_page else None
+    users = users[:per_page]
+    
+    active_filters = {key: value for key, value in filters.items() if value}
+    return render_template('admin_users.html',
+                         users=users,
+                         filters=filters,
+                         per_page=per_page,
+                         is_first_page=not after,
+                         next_url=url_for('admin_users', after=next_after, per_page=per_page, **active_filters) if next_after else None,
+                         first_url=url_for('admin_users', per_page=per_page, **active_filters))
 
 @app.route('/admin/create_user', methods=['GET', 'POST'])
 @login_required
@@ -1065,11 +2899,12 @@ def create_user():
         else:
             new_user = User(
                 username=username,
-                password_hash=generate_password_hash(password),
+                password_hash=hash_password(password),
                 role=role
             )
             db.session.add(new_user)
             db.session.commit()
+            log_activity('create_user', details=f'Usuario: {username} ({role})')
             flash('Usuario creado exitosamente.', 'success')
             return redirect(url_for('admin_users'))
     
@@ -1106,7 +2941,7 @@ def create_temporary_user():
         # Crear usuario temporal
         new_user = User(
             username=username,
-            password_hash=generate_password_hash(password),
+            password_hash=hash_password(password),
             role='user', # Siempre se crea como 'user', nunca como 'admin'
             is_temporary=True,
             expires_at=expires_at,
@@ -1116,9 +2951,10 @@ def create_temporary_user():
         
         db.session.add(new_user)
         db.session.commit()
+        log_activity('create_temporary_user', details=f'Usuario: {username} ({duration_minutes} min)')
         
-        # Limpiar usuarios expirados
-        cleanup_expired_users()
+        # Programar su eliminación cuando venza
+        expiry_scheduler.schedule(expires_at, new_user.id)
         
         return jsonify({
             'success': True,
@@ -1127,9 +2963,204 @@ def create_temporary_user():
             'login_token': login_token
         })
         
+    except PasswordHashBusy:
+        raise
     except Exception as e:
         return jsonify({'error': f'Error al crear usuario: {str(e)}'}), 500
 
+# === ALTA MASIVA DE USUARIOS DESDE CSV/XLSX ===
+BULK_USER_EXTENSIONS = {'csv', 'xlsx'}
+BULK_USER_MAX_ROWS = int(os.environ.get('BULK_USER_MAX_ROWS', 200))
+
+# Encabezados aceptados en el archivo (en español o inglés)
+BULK_USER_COLUMNS = {
+    'username': 'username', 'usuario': 'username',
+    'password': 'password', 'contraseña': 'password', 'contrasena': 'password',
+    'role': 'role', 'rol': 'role',
+    'duration': 'duration', 'duración': 'duration', 'duracion': 'duration'
+}
+
+def read_bulk_user_rows(file_storage):
+    """Lee las filas del archivo subido como una lista de diccionarios"""
+    extension = file_storage.filename.rsplit('.', 1)[1].lower()
+    content = file_storage.read()
+    
+    if extension == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = next(rows, None) or ()
+        records = [dict(zip(headers, row)) for row in rows]
+        workbook.close()
+    else:
+        text_content = content.decode('utf-8-sig')
+        try:
+            dialect = csv.Sniffer().sniff(text_content[:2048], delimiters=',;')
+        except csv.Error:
+            dialect = csv.excel
+        records = list(csv.DictReader(io.StringIO(text_content), dialect=dialect))
+    
+    rows = []
+    for record in records:
+        row = {}
+        for header, value in record.items():
+            key = BULK_USER_COLUMNS.get(str(header or '').strip().lower())
+            if key:
+                row[key] = str(value).strip() if value is not None else ''
+        if any(row.values()):
+            rows.append(row)
+    return rows
+
+def validate_bulk_user_rows(rows):
+    """Valida las filas; devuelve (usuarios, errores)"""
+    errors = []
+    users = []
+    seen = set()
+    existing = {row.username for row in db.session.query(User.username).filter(
+        User.username.in_([row.get('username', '') for row in rows])
+    )}
+    
+    for line, row in enumerate(rows, start=2):
+        username = row.get('username', '')
+        role = row.get('role') or 'user'
+        duration = row.get('duration', '')
+        
+        if not username:
+            errors.append(f'Fila {line}: falta el nombre de usuario')
+            continue
+        if username in seen or username in existing:
+            errors.append(f'Fila {line}: el usuario {username} ya existe')
+            continue
+        if role not in ('user', 'admin'):
+            errors.append(f'Fila {line}: rol no válido ({role})')
+            continue
+        if duration:
+            try:
+                duration = int(float(duration))
+            except ValueError:
+                errors.append(f'Fila {line}: duración no válida ({duration})')
+                continue
+            if duration <= 0:
+                errors.append(f'Fila {line}: la duración debe ser mayor que cero')
+                continue
+            if role == 'admin':
+                errors.append(f'Fila {line}: los usuarios temporales no pueden ser administradores')
+                continue
+        
+        seen.add(username)
+        users.append({
+            'username': username,
+            'password': row.get('password') or secrets.token_urlsafe(9),
+            'role': role,
+            'duration': duration or None
+        })
+    return users, errors
+
+def build_credentials_sheet(users):
+    """Genera el Excel con las credenciales y los enlaces QR"""
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'Credenciales'
+    sheet.append(['Usuario', 'Contraseña', 'Rol', 'Expira (UTC)', 'Enlace QR'])
+    for user in users:
+        sheet.append([
+            user['username'],
+            user['password'],
+            user['role'],
+            user['expires_at'].strftime('%d/%m/%Y %H:%M') if user['expires_at'] else '',
+            url_for('qr_login', token=user['login_token'], _external=True) if user['login_token'] else ''
+        ])
+    for column, width in zip('ABCDE', (20, 18, 8, 18, 80)):
+        sheet.column_dimensions[column].width = width
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+@app.route('/admin/bulk_create_users', methods=['POST'])
+@login_required
+def bulk_create_users():
+    # Verificar si el usuario es administrador
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Acceso denegado. Solo los administradores pueden acceder a esta sección.'}), 403
+    
+    # Verificar si el usuario está autenticado como admin
+    if not check_admin_session():
+        return redirect(url_for('admin_login'))
+    
+    file = request.files.get('file')
+    if not file or not file.filename or '.' not in file.filename or \
+            file.filename.rsplit('.', 1)[1].lower() not in BULK_USER_EXTENSIONS:
+        flash('Debe subir un archivo .csv o .xlsx', 'error')
+        return redirect(url_for('admin_panel'))
+    
+    try:
+        rows = read_bulk_user_rows(file)
+    except Exception as e:
+        flash(f'No se pudo leer el archivo: {str(e)}', 'error')
+        return redirect(url_for('admin_panel'))
+    
+    if not rows:
+        flash('El archivo no contiene usuarios', 'error')
+        return redirect(url_for('admin_panel'))
+    if len(rows) > BULK_USER_MAX_ROWS:
+        flash(f'Máximo {BULK_USER_MAX_ROWS} usuarios por archivo', 'error')
+        return redirect(url_for('admin_panel'))
+    
+    users, errors = validate_bulk_user_rows(rows)
+    if errors:
+        for error in errors[:10]:
+            flash(error, 'error')
+        if len(errors) > 10:
+            flash(f'... y {len(errors) - 10} errores más. No se creó ningún usuario.', 'error')
+        return redirect(url_for('admin_panel'))
+    
+    # Hash de todas las contraseñas en paralelo en el pool de procesos
+    hashes = hash_passwords([user['password'] for user in users])
+    
+    now = datetime.now(timezone.utc)
+    records = []
+    for user, password_hash in zip(users, hashes):
+        temporary = user['duration'] is not None
+        user['expires_at'] = now + timedelta(minutes=user['duration']) if temporary else None
+        user['login_token'] = secrets.token_urlsafe(32) if temporary else None
+        records.append({
+            'username': user['username'],
+            'password_hash': password_hash,
+            'role': user['role'],
+            'created_at': now,
+            'is_temporary': temporary,
+            'expires_at': user['expires_at'],
+            'temp_password': user['password'] if temporary else None,
+            'login_token': user['login_token'],
+            'login_token_used': False
+        })
+    
+    try:
+        # Todo el lote en una sola transacción
+        db.session.execute(insert(User), records)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al crear usuarios: {str(e)}', 'error')
+        return redirect(url_for('admin_panel'))
+    
+    bump_version('user')
+    temporary_users = db.session.query(User.id, User.expires_at).filter(
+        User.username.in_([user['username'] for user in users if user['expires_at']])
+    ).all()
+    for user_id, expires_at in temporary_users:
+        expiry_scheduler.schedule(expires_at, user_id)
+    log_activity('bulk_create_users', details=f'{len(users)} usuarios ({len(temporary_users)} temporales)')
+    
+    return send_file(
+        build_credentials_sheet(users),
+        as_attachment=True,
+        download_name=f"credenciales_{now.strftime('%Y%m%d_%H%M')}.xlsx",
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
 @app.route('/admin/edit_user/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 def edit_user(user_id):
@@ -1158,9 +3189,11 @@ def edit_user(user_id):
             
             # Solo actualizar la contraseña si se proporciona una nueva
             if password:
-                user.password_hash = generate_password_hash(password)
+                user.password_hash = hash_password(password)
             
             db.session.commit()
+            invalidate_user_cache(user.id)
+            log_activity('edit_user', details=f'Usuario: {username} ({role})')
             flash('Usuario actualizado exitosamente.', 'success')
             return redirect(url_for('admin_users'))
     
@@ -1184,8 +3217,11 @@ def delete_user(user_id):
         flash('No puedes eliminar tu propia cuenta.', 'error')
         return redirect(url_for('admin_users'))
     
+    detach_user_references([user.id])
     db.session.delete(user)
     db.session.commit()
+    invalidate_user_cache(user_id)
+    log_activity('delete_user', details=f'Usuario: {user.username}')
     flash('Usuario eliminado exitosamente.', 'success')
     return redirect(url_for('admin_users'))
 
@@ -1212,15 +3248,24 @@ def admin_login():
     if request.method == 'POST':
         password = request.form.get('password')
         
+        retry_after = check_login_rate_limit('admin_login', current_user.username)
+        if retry_after:
+            return rate_limited_response('admin_login.html', retry_after)
+        
         # Verificar la contraseña del usuario actual (como GitHub)
-        if check_password_hash(current_user.password_hash, password):
+        user = db.session.get(User, current_user.id)
+        if user and verify_password(user.password_hash, password):
+            upgrade_password_hash(user, password)
+            reset_login_rate_limit(current_user.username)
             session['admin_authenticated'] = True
             session['admin_login_time'] = datetime.now(timezone.utc).isoformat()
             # Configurar la sesión para que expire cuando se cierre el navegador
             session.permanent = False
+            log_activity('admin_login')
             flash('Autenticación de administrador exitosa.', 'success')
             return redirect(url_for('admin_panel'))
         else:
+            log_activity('admin_login_failed')
             flash('Contraseña incorrecta.', 'error')
     
     return render_template('admin_login.html')
@@ -1249,8 +3294,11 @@ def delete_temporary_user(user_id):
         if not user.is_temporary:
             return jsonify({'error': 'Solo se pueden eliminar usuarios temporales'}), 400
         
+        detach_user_references([user.id])
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_cache(user_id)
+        log_activity('delete_temporary_user', details=f'Usuario: {user.username}')
         
         return jsonify({
             'success': True,
@@ -1281,16 +3329,21 @@ def get_temporary_user_qr(user_id):
 
 @app.route('/qr_login/<token>')
 def qr_login(token):
+    retry_after = check_login_rate_limit('qr_login')
+    if retry_after:
+        return rate_limited_response('login.html', retry_after)
+    
     # Buscar el usuario por el token, que no esté usado y no haya expirado
     user = User.query.filter_by(login_token=token, login_token_used=False).first()
 
-    if user and user.expires_at > datetime.now(timezone.utc):
+    if user and user.expires_at and to_naive_utc(user.expires_at) > to_naive_utc(datetime.now(timezone.utc)):
         # Marcar el token como usado para que no se pueda volver a usar
         user.login_token_used = True
         db.session.commit()
         
         # Iniciar sesión del usuario
         login_user(user)
+        log_activity('qr_login')
         
         flash(f'¡Bienvenido, {user.username}! Has iniciado sesión exitosamente.', 'success')
         return redirect(url_for('dashboard'))
@@ -1312,6 +3365,134 @@ def get_user_password(user_id):
         
     return jsonify({'success': True, 'password': user.temp_password})
 
+# === PETICIONES HTTP SALIENTES ===
+# Una sesión de requests por hilo: reutiliza conexiones con Google sin compartir
+# el objeto Session entre hilos. Toda petición saliente lleva timeout para que un
+# servidor lento no retenga indefinidamente un hilo del worker.
+OUTBOUND_TIMEOUT = float(os.environ.get('OUTBOUND_TIMEOUT', 30))
+
+_outbound_http = threading.local()
+
+def outbound_session():
+    """Devuelve la sesión HTTP del hilo actual"""
+    http = getattr(_outbound_http, 'session', None)
+    if http is None:
+        import requests
+        http = _outbound_http.session = requests.Session()
+    return http
+
+def fetch_google_export(url):
+    """Descarga una exportación de Google Drive con timeout"""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        response = outbound_session().get(url, timeout=OUTBOUND_TIMEOUT)
+        outcome = str(response.status_code)
+        return response
+    finally:
+        observe_outbound('google_export', started, outcome)
+
+# === VALIDACIÓN DE ENLACES DE GOOGLE DRIVE ===
+# Al guardar los enlaces se comprueba cada URL en paralelo con un pool acotado de
+# hilos. Los resultados se cachean por URL para no repetir peticiones.
+LINK_CHECK_WORKERS = int(os.environ.get('LINK_CHECK_WORKERS', 24))  # un año completo de enlaces
+LINK_CHECK_TIMEOUT = float(os.environ.get('LINK_CHECK_TIMEOUT', 5))
+LINK_CHECK_CACHE_TTL = int(os.environ.get('LINK_CHECK_CACHE_TTL', 600))
+LINK_CHECK_CACHE_SIZE = 512
+
+GOOGLE_DRIVE_HOSTS = ('docs.google.com', 'drive.google.com')
+_DRIVE_URL_RE = re.compile(r'^https://([^/]+)/.*?(?:/d/|[?&]id=)([\w-]{10,})')
+
+_link_pool = None
+_link_pool_pid = None
+_link_pool_lock = threading.Lock()
+_link_check_cache = OrderedDict()
+_link_check_cache_lock = threading.Lock()
+
+def _get_link_pool():
+    global _link_pool, _link_pool_pid
+    if _link_pool is None or _link_pool_pid != os.getpid():
+        with _link_pool_lock:
+            if _link_pool is None or _link_pool_pid != os.getpid():
+                _link_pool = ThreadPoolExecutor(max_workers=LINK_CHECK_WORKERS, thread_name_prefix='link-check')
+                _link_pool_pid = os.getpid()
+    return _link_pool
+
+def _check_drive_link(url):
+    """Consulta la URL sin seguir redirecciones y clasifica el resultado"""
+    started = time.perf_counter()
+    status = _classify_drive_link(url)
+    observe_outbound('drive_link_check', started, status)
+    return status
+
+def _classify_drive_link(url):
+    import requests
+    
+    try:
+        response = outbound_session().get(url, timeout=LINK_CHECK_TIMEOUT, allow_redirects=False, stream=True)
+        response.close()
+    except requests.exceptions.Timeout:
+        return 'timeout'
+    except requests.exceptions.RequestException:
+        return 'error'
+    
+    if response.status_code == 200:
+        return 'ok'
+    if response.status_code == 404:
+        return 'not_found'
+    if response.status_code in (401, 403):
+        return 'private'
+    if response.is_redirect:
+        # Google redirige al login cuando el archivo no está compartido
+        location = response.headers.get('Location', '')
+        return 'private' if 'accounts.google.com' in location else 'ok'
+    return 'error'
+
+def submit_drive_link_checks(urls):
+    """Lanza la validación de las URLs sin esperar; devuelve el trabajo pendiente"""
+    results = {}
+    pending = {}
+    now = time.monotonic()
+    
+    for url in set(urls):
+        match = _DRIVE_URL_RE.match(url)
+        if not match or match.group(1) not in GOOGLE_DRIVE_HOSTS:
+            results[url] = 'invalid'
+            continue
+        with _link_check_cache_lock:
+            cached = _link_check_cache.get(url)
+        hit = bool(cached) and now - cached[1] < LINK_CHECK_CACHE_TTL
+        count_cache('drive_link', hit)
+        if hit:
+            results[url] = cached[0]
+        else:
+            pending[url] = _get_link_pool().submit(_check_drive_link, url)
+    return results, pending, now
+
+def collect_drive_link_checks(checks):
+    """Espera los resultados lanzados por submit_drive_link_checks; devuelve {url: estado}"""
+    results, pending, now = checks
+    # Todas las peticiones ya están en curso; se espera como máximo un timeout
+    deadline = time.monotonic() + LINK_CHECK_TIMEOUT + 1
+    for url, future in pending.items():
+        try:
+            status = future.result(timeout=max(0, deadline - time.monotonic()))
+        except Exception:
+            status = 'timeout'
+        results[url] = status
+        # Los fallos de red no se cachean para reintentar en el próximo guardado
+        if status in ('ok', 'private', 'not_found'):
+            with _link_check_cache_lock:
+                _link_check_cache[url] = (status, now)
+                _link_check_cache.move_to_end(url)
+                while len(_link_check_cache) > LINK_CHECK_CACHE_SIZE:
+                    _link_check_cache.popitem(last=False)
+    return results
+
+def validate_drive_links(urls):
+    """Valida una lista de URLs en paralelo; devuelve {url: estado}"""
+    return collect_drive_link_checks(submit_drive_link_checks(urls))
+
 @app.route('/admin/get_links/<int:year>')
 @login_required
 def get_links(year):
@@ -1319,6 +3500,11 @@ def get_links(year):
         return jsonify({'error': 'Acceso denegado'}), 403
     
     try:
+        etag = make_etag('links', year, get_version('planilla'))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         # Obtener todas las planillas del año especificado
         planillas = Planilla.query.filter_by(año=year).all()
         
@@ -1335,14 +3521,76 @@ def get_links(year):
             elif 'laboratorio' in planilla.titulo.lower() or 'lab' in planilla.titulo.lower():
                 links['laboratorio'][planilla.mes] = planilla.url_google_drive
         
-        return jsonify({
+        return with_etag(jsonify({
             'success': True,
             'links': links
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'error': f'Error al obtener enlaces: {str(e)}'}), 500
 
+# === MATRIZ DE DISPONIBILIDAD DE PLANILLAS ===
+# Qué meses tienen planilla cargada, por año y servicio, en una sola consulta
+# agrupada. Se cachea en memoria hasta que cambia la tabla planilla.
+PLANILLA_SERVICES = ('salud', 'laboratorio')
+
+_availability_cache = {'version': None, 'data': None}
+_availability_lock = threading.Lock()
+
+def planilla_service_expr():
+    """Clasifica la planilla por servicio con las mismas reglas que get_links.
+    Las planillas iniciales de 2025 no indican el servicio en el título, así que
+    en ese caso se usa la descripción."""
+    titulo = func.lower(Planilla.titulo)
+    descripcion = func.lower(func.coalesce(Planilla.descripcion, ''))
+    return db.case(
+        (titulo.contains('salud') | titulo.contains('casanare'), 'salud'),
+        (titulo.contains('laboratorio') | titulo.contains('lab'), 'laboratorio'),
+        (descripcion.contains('salud') | descripcion.contains('casanare'), 'salud'),
+        (descripcion.contains('laboratorio'), 'laboratorio'),
+        else_=None
+    )
+
+def get_planilla_availability():
+    """Devuelve {año: {servicio: [bool x 12]}} con los meses que tienen planilla"""
+    version = get_version('planilla')
+    count_cache('planilla_availability', _availability_cache['version'] == version)
+    if _availability_cache['version'] == version:
+        return _availability_cache['data']
+    
+    service = planilla_service_expr().label('service')
+    rows = db.session.execute(
+        db.select(Planilla.año, Planilla.mes, service)
+        .where(Planilla.mes.between(1, 12))
+        .group_by(Planilla.año, Planilla.mes, service)
+    )
+    matrix = {}
+    for year, mes, service_name in rows:
+        if service_name is None:
+            continue
+        months = matrix.setdefault(year, {name: [False] * 12 for name in PLANILLA_SERVICES})
+        months[service_name][mes - 1] = True
+    
+    with _availability_lock:
+        _availability_cache.update(version=version, data=matrix)
+    return matrix
+
+@app.route('/api/planillas/availability')
+@login_required
+def planilla_availability():
+    """Matriz año × mes × servicio para marcar los meses sin planilla"""
+    etag = make_etag('planilla_availability', get_version('planilla'))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    matrix = get_planilla_availability()
+    return with_etag(jsonify({
+        'success': True,
+        'services': list(PLANILLA_SERVICES),
+        'years': {str(year): months for year, months in sorted(matrix.items())}
+    }), etag)
+
 @app.route('/admin/save_links', methods=['POST'])
 @login_required
 def save_links():
@@ -1369,6 +3617,17 @@ def save_links():
             print("ERROR: Año no especificado")
             return jsonify({'error': 'Año no especificado'}), 400
         
+        # Lanzar la validación de los enlaces mientras se actualiza la base de datos
+        link_urls = {}
+        for tipo in ('salud', 'laboratorio'):
+            for mes in range(1, 13):
+                url = links.get(tipo, {}).get(str(mes)) or links.get(tipo, {}).get(mes)
+                if url and url.strip():
+                    link_urls[(tipo, mes)] = url.strip()
+        validation = None
+        if data.get('validate', True) and link_urls:
+            validation = submit_drive_link_checks(link_urls.values())
+        
         # Procesar enlaces de Salud Casanare
         print("Procesando enlaces de Salud Casanare...")
         for mes in range(1, 13):
@@ -1442,11 +3701,24 @@ def save_links():
         print("Guardando en la base de datos...")
         db.session.commit()
         print("Base de datos actualizada exitosamente")
+        log_activity('save_links', details=f'Año: {year}')
         
         response_data = {
             'success': True,
             'message': f'Enlaces guardados exitosamente para el año {year}'
         }
+        
+        if validation is not None:
+            statuses = collect_drive_link_checks(validation)
+            link_status = {'salud': {}, 'laboratorio': {}}
+            broken_links = []
+            for (tipo, mes), url in link_urls.items():
+                status = statuses[url]
+                link_status[tipo][mes] = status
+                if status != 'ok':
+                    broken_links.append({'tipo': tipo, 'mes': mes, 'status': status})
+            response_data['link_status'] = link_status
+            response_data['broken_links'] = broken_links
         print(f"Respuesta: {response_data}")
         return jsonify(response_data)
         
@@ -1468,12 +3740,16 @@ def update_global_year():
         if not new_year:
             return jsonify({'error': 'Año no especificado'}), 400
         
-        # Guardar el año en la sesión
-        session['global_year'] = new_year
+        try:
+            new_year = int(new_year)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Año inválido'}), 400
+        
+        save_settings(global_year=new_year)
         
-        # Actualizar títulos de planillas existentes para el año anterior
-        old_year = session.get('global_year', 2026)  # Usar el año actual de la sesión
-        planillas_to_update = Planilla.query.filter_by(año=old_year).all()
+        # Actualizar títulos de las planillas del año seleccionado (las de otros
+        # años no se mueven: cambiar el año global no migra datos)
+        planillas_to_update = Planilla.query.filter_by(año=new_year).all()
         
         nombres_meses = {
             1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
@@ -1496,6 +3772,8 @@ def update_global_year():
             planilla.año = new_year
         
         db.session.commit()
+        invalidate_page_cache('mes_2026')
+        log_activity('update_global_year', details=f'Año: {new_year}')
         
         return jsonify({
             'success': True,
@@ -1512,7 +3790,7 @@ def update_global_year():
 @login_required
 def descargar_planilla_2026(mes, formato):
     # Obtener el año dinámico
-    year_2026 = session.get('global_year', 2026)
+    year_2026 = get_setting('global_year')
     
     # Obtener la planilla del mes específico para el año dinámico
     planilla = Planilla.query.filter_by(mes=mes, año=year_2026).first()
@@ -1541,11 +3819,12 @@ def descargar_planilla_2026(mes, formato):
             return redirect(url_for('salud_casanare2026_google', mes=mes))
         
         file_id = match.group(1)
+        log_activity('download_planilla', details=f'{nombre_archivo} ({formato})')
         
         if formato == 'excel':
             # URL de descarga directa para Excel
             download_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=xlsx"
-            response = requests.get(download_url)
+            response = fetch_google_export(download_url)
             
             if response.status_code == 200:
                 import tempfile
@@ -1568,7 +3847,7 @@ def descargar_planilla_2026(mes, formato):
         elif formato == 'pdf':
             # URL de descarga directa para PDF
             download_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=pdf"
-            response = requests.get(download_url)
+            response = fetch_google_export(download_url)
             
             if response.status_code == 200:
                 import tempfile
@@ -1593,7 +3872,7 @@ def descargar_planilla_2026(mes, formato):
             try:
                 # Descargar como PDF desde Google Drive para mantener formato
                 pdf_download_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=pdf"
-                response = requests.get(pdf_download_url)
+                response = fetch_google_export(pdf_download_url)
                 
                 if response.status_code == 200:
                     import tempfile
@@ -1727,62 +4006,358 @@ def get_app_url():
     port = os.environ.get('PORT', 5000)
     return f"http://localhost:{port}"
 
-def keep_alive_improved():
-    """Sistema de keep-alive mejorado con logging y manejo de errores"""
+_keep_alive_state = {'failures': 0}
+KEEP_ALIVE_MAX_FAILURES = 5
+
+def keep_alive_ping():
+    """Ping por la URL pública para que Render no duerma el servicio.
+    
+    Render solo cuenta el tráfico entrante, así que basta con una petición
+    ligera a /ping; el calentamiento de cachés lo hace warm_up() en cada proceso.
+    Devuelve el intervalo hasta el siguiente ping.
+    """
+    import requests
+    
     app_url = get_app_url()
     
-    if not app_url:
-        print("⚠️  KEEP-ALIVE: No se pudo determinar la URL de la aplicación")
-        return
+    if not app_url or '://localhost' in app_url:
+        # En local no hace falta mantener despierta la aplicación
+        return KEEP_ALIVE_INTERVAL
+    
+    try:
+        response = outbound_session().get(f"{app_url}/ping", timeout=15)
+        response.raise_for_status()
+        if _keep_alive_state['failures'] > 0:
+            print(f"✅ KEEP-ALIVE: Conexión restaurada después de {_keep_alive_state['failures']} fallos")
+        _keep_alive_state['failures'] = 0
+    except requests.exceptions.Timeout:
+        _keep_alive_state['failures'] += 1
+        print(f"⏰ KEEP-ALIVE: Timeout en /ping (intento {_keep_alive_state['failures']})")
+    except requests.exceptions.RequestException as e:
+        _keep_alive_state['failures'] += 1
+        print(f"🔌 KEEP-ALIVE: Error en /ping (intento {_keep_alive_state['failures']}): {e}")
     
-    print(f"🚀 KEEP-ALIVE: Iniciando con URL: {app_url}")
-    print(f"⏰ KEEP-ALIVE: Intervalo: {KEEP_ALIVE_INTERVAL} segundos")
+    # Si hay muchos fallos consecutivos, aumentar el intervalo
+    if _keep_alive_state['failures'] >= KEEP_ALIVE_MAX_FAILURES:
+        print(f"🚨 KEEP-ALIVE: Demasiados fallos consecutivos ({_keep_alive_state['failures']}). Pausando...")
+        return KEEP_ALIVE_INTERVAL * 2  # Doble tiempo
+    return KEEP_ALIVE_INTERVAL
+
+# === CALENTAMIENTO EN PROCESO ===
+# Cada worker se calienta a sí mismo al arrancar y en cada ciclo de keep-alive:
+# así, tras un rato sin tráfico, el primer usuario no paga conexiones nuevas a la
+# base de datos ni cachés vacías.
+WARM_UP_INTERVAL = int(os.environ.get('WARM_UP_INTERVAL', KEEP_ALIVE_INTERVAL))
+
+def warm_up():
+    """Toca el pool de la base de datos, refresca las cachés y pre-renderiza las páginas más visitadas"""
+    started = time.perf_counter()
     
-    consecutive_failures = 0
-    max_failures = 5
+    db.session.execute(text('SELECT 1'))
+    get_settings()
+    get_task_stats()
+    get_planilla_availability()
+    get_admin_snapshot()
     
-    # Lista de endpoints para probar
-    endpoints = ['/ping', '/health', '/', '/status']
+    rendered = warm_pages()
     
-    while True:
-        success = False
-        
-        # Probar múltiples endpoints
-        for endpoint in endpoints:
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"🔥 WARM-UP: Proceso {os.getpid()} caliente en {elapsed:.0f} ms ({rendered} páginas renderizadas)")
+
+def warm_pages():
+    """Pre-renderiza las páginas cacheables que falten; devuelve cuántas renderizó"""
+    if app.debug:
+        return 0
+    rendered = 0
+    year_2026 = get_setting('global_year')
+    with app.test_request_context():
+        keys = [(('inicio',), render_inicio_page)]
+        for mes in range(1, 13):
+            for role in ('admin', 'user'):
+                keys.append((('mes', mes, role), lambda mes=mes: render_mes_page(mes)))
+                keys.append((('mes_2026', mes, year_2026, role), lambda mes=mes: render_mes_2026_page(mes, year_2026)))
+        for key, render in keys:
+            if key not in _page_cache:
+                get_cached_page(key, render)
+                rendered += 1
+    return rendered
+
+# === PRECARGA EN EL MAESTRO DE GUNICORN (preload_app) ===
+# Antes de crear los workers, el maestro compila las plantillas, lista las
+# imágenes de los meses y pre-renderiza las páginas estáticas. Los workers las
+# heredan por copy-on-write, así que un worker reciclado por max_requests arranca
+# caliente. Las cachés derivadas de la base de datos van ligadas a las versiones
+# de table_version, así que lo heredado se recalcula solo si los datos cambiaron.
+def precompile_templates():
+    """Compila todas las plantillas Jinja y guarda su bytecode en JINJA_CACHE_DIR.
+    
+    Se ejecuta en el build (build.sh) y al arrancar el maestro de Gunicorn.
+    """
+    names = app.jinja_env.list_templates(extensions=('html',))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+def prefork_warm_up():
+    """Calentamiento del proceso maestro; lo llama el hook when_ready de Gunicorn"""
+    started = time.perf_counter()
+    templates = precompile_templates()
+    get_month_manifest()
+    with app.app_context():
+        pages = warm_pages()
+        db.session.remove()
+        # Los workers no deben heredar conexiones abiertas del maestro
+        db.engine.dispose()
+    # Lo creado hasta aquí no se vuelve a recorrer en el GC: evita que los
+    # workers toquen (y copien) esas páginas de memoria
+    gc.freeze()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"🔥 PRELOAD: {templates} plantillas compiladas y {pages} páginas pre-renderizadas en {elapsed:.0f} ms")
+
+def reset_after_fork():
+    """Lo llama el hook post_fork de Gunicorn en cada worker nuevo"""
+    global PROCESS_STARTED, _BOOT_ID
+    PROCESS_STARTED = time.time()
+    # Con preload_app todos los workers heredarían el del maestro
+    _BOOT_ID = secrets.token_hex(4)
+    metrics.reset()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+# === TAREAS DE FONDO CON ELECCIÓN DE LÍDER ===
+# Con varios workers de Gunicorn cada proceso arranca el planificador, pero solo
+# el que obtiene el lock de líder ejecuta las tareas. Si el líder muere (o se
+# recicla por max_requests) el lock se libera y otro worker toma el relevo.
+# El lock es un advisory lock de PostgreSQL (válido entre nodos) o, con SQLite,
+# un flock sobre SCHEDULER_LOCK_FILE (válido dentro de la máquina).
+SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'serviaseo-scheduler.lock'))
+SCHEDULER_LOCK_ID = 72025  # clave del advisory lock en PostgreSQL
+SCHEDULER_RETRY_INTERVAL = int(os.environ.get('SCHEDULER_RETRY_INTERVAL', 30))
+EXPIRY_SYNC_INTERVAL = int(os.environ.get('EXPIRY_SYNC_INTERVAL', 60))
+DRIVE_SYNC_INTERVAL = int(os.environ.get('DRIVE_SYNC_INTERVAL', 3600))
+
+class LeaderLock:
+    """Lock de líder entre procesos; se mantiene mientras el proceso viva"""
+
+    def __init__(self, lock_file, lock_id):
+        self.lock_file = lock_file
+        self.lock_id = lock_id
+        self._handle = None
+
+    def acquire(self):
+        """Intenta obtener el lock sin bloquear; devuelve True si este proceso es líder"""
+        if self._handle is not None:
+            return self.is_held()
+        try:
+            with app.app_context():
+                engine = db.engine
+            if engine.dialect.name == 'postgresql':
+                # El lock es de sesión: en AUTOCOMMIT la conexión no queda "idle in
+                # transaction" (que impediría el VACUUM) mientras se mantiene
+                conn = engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+                if conn.execute(text('SELECT pg_try_advisory_lock(:id)'), {'id': self.lock_id}).scalar():
+                    self._handle = conn
+                else:
+                    conn.close()
+            elif fcntl is None:
+                # Sin flock (Windows) solo corre un proceso: el servidor de desarrollo
+                self._handle = True
+            else:
+                handle = open(self.lock_file, 'a')
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.close()
+                else:
+                    self._handle = handle
+        except Exception as e:
+            print(f"⚠️  SCHEDULER: No se pudo intentar el lock de líder: {e}")
+        return self._handle is not None
+
+    def is_held(self):
+        """Comprueba que el lock sigue vigente (la conexión de PostgreSQL puede caerse)"""
+        if self._handle is None:
+            return False
+        if hasattr(self._handle, 'execute'):
             try:
-                response = requests.get(f"{app_url}{endpoint}", timeout=15)
-                
-                if response.status_code == 200:
-                    if consecutive_failures > 0:
-                        print(f"✅ KEEP-ALIVE: Conexión restaurada después de {consecutive_failures} fallos (endpoint: {endpoint})")
-                        consecutive_failures = 0
-                    else:
-                        print(f"✅ KEEP-ALIVE: Ping exitoso - {endpoint} - Status: {response.status_code}")
-                    success = True
-                    break  # Si un endpoint funciona, no probar los demás
-                    
-            except requests.exceptions.Timeout:
-                print(f"⏰ KEEP-ALIVE: Timeout en {endpoint}")
-                continue
+                self._handle.execute(text('SELECT 1'))
+            except Exception:
+                self._handle = None
+                return False
+        return True
+
+class BackgroundScheduler:
+    """Ejecuta tareas periódicas en el proceso líder (o en todos, si leader_only=False).
+    
+    Cada tarea corre en su propio hilo con su propio lock: si la ejecución anterior
+    no ha terminado, la siguiente se omite. Al intervalo se le suma un retardo
+    aleatorio (jitter). Si la función devuelve un número, se usa como intervalo
+    hasta la próxima ejecución. La próxima ejecución de las tareas del líder se
+    guarda en la tabla scheduler_job: un líder nuevo (p. ej. tras reciclar el
+    worker) continúa el calendario en lugar de ejecutarlas de inmediato.
+    """
+
+    def __init__(self, leader_lock, retry_interval):
+        self.leader_lock = leader_lock
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self._jobs = {}
+        self._on_leader = []
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def add_job(self, name, func, interval, jitter=0, leader_only=True, delay_first=False):
+        """delay_first: la primera ejecución espera un intervalo completo (la tarea ya
+        corrió al arrancar el proceso)"""
+        self._jobs[name] = {
+            'name': name, 'func': func, 'interval': interval, 'jitter': jitter, 'leader_only': leader_only,
+            'delay_first': delay_first, 'next_run': None, 'running': threading.Lock(), 'last_run': None,
+            'last_error': None
+        }
+
+    def on_leader(self, func):
+        """Registra una función que se ejecuta al obtener el liderazgo"""
+        self._on_leader.append(func)
+        return func
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.is_leader = False
+            self._thread = threading.Thread(target=self._run, name='background-scheduler', daemon=True)
+            self._thread.start()
+
+    def status(self):
+        return {
+            'pid': os.getpid(),
+            'running': self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            'leader': self.is_leader,
+            'jobs': {
+                name: {'last_run': job['last_run'], 'last_error': job['last_error'], 'running': job['running'].locked()}
+                for name, job in self._jobs.items()
+            }
+        }
+
+    def _delay(self, job, interval=None):
+        return (interval or job['interval']) + random.uniform(0, job['jitter'])
+
+    def _run(self):
+        while True:
+            try:
+                leader = self.leader_lock.acquire()
+                if leader and not self.is_leader:
+                    print(f"👑 SCHEDULER: Proceso {os.getpid()} es el líder de las tareas de fondo")
+                    scheduled = self._load_schedule()
+                    for job in self._jobs.values():
+                        if job['leader_only']:
+                            at = scheduled.get(job['name'])
+                            job['next_run'] = None if at is None else time.monotonic() + max(at - time.time(), 0)
+                    for func in self._on_leader:
+                        func()
+                self.is_leader = leader
                 
-            except requests.exceptions.ConnectionError:
-                print(f"🔌 KEEP-ALIVE: Error de conexión en {endpoint}")
-                continue
+                now = time.monotonic()
+                next_run = now + self.retry_interval
+                for job in self._jobs.values():
+                    if job['leader_only'] and not leader:
+                        continue
+                    if job['next_run'] is None:
+                        # Primera ejecución repartida dentro del jitter (o un intervalo después)
+                        job['next_run'] = now + (self._delay(job) if job['delay_first'] else random.uniform(0, job['jitter']))
+                    if job['next_run'] <= now:
+                        job['next_run'] = now + self._delay(job)
+                        self._launch(job)
+                    next_run = min(next_run, job['next_run'])
                 
+                self._wakeup.wait(max(next_run - time.monotonic(), 0.1))
             except Exception as e:
-                print(f"❌ KEEP-ALIVE: Error en {endpoint}: {str(e)}")
-                continue
-        
-        if not success:
-            consecutive_failures += 1
-            print(f"❌ KEEP-ALIVE: Todos los endpoints fallaron (intento {consecutive_failures})")
-        
-        # Si hay muchos fallos consecutivos, aumentar el intervalo
-        if consecutive_failures >= max_failures:
-            print(f"🚨 KEEP-ALIVE: Demasiados fallos consecutivos ({consecutive_failures}). Pausando...")
-            time.sleep(KEEP_ALIVE_INTERVAL * 2)  # Doble tiempo
-        else:
-            time.sleep(KEEP_ALIVE_INTERVAL)
+                print(f"❌ SCHEDULER: Error en el planificador: {e}")
+                time.sleep(self.retry_interval)
+
+    def _launch(self, job):
+        if not job['running'].acquire(blocking=False):
+            print(f"⏭️  SCHEDULER: '{job['name']}' sigue en ejecución; se omite esta vez")
+            return
+        threading.Thread(target=self._execute, args=(job,), name=f"job-{job['name']}", daemon=True).start()
+
+    def _execute(self, job):
+        try:
+            with app.app_context():
+                result = job['func']()
+            job['last_error'] = None
+            if isinstance(result, (int, float)) and not isinstance(result, bool):
+                job['next_run'] = time.monotonic() + self._delay(job, result)
+        except Exception as e:
+            job['last_error'] = str(e)
+            print(f"❌ SCHEDULER: Error en la tarea '{job['name']}': {e}")
+        finally:
+            job['last_run'] = datetime.now(timezone.utc).isoformat()
+            if job['leader_only']:
+                self._save_schedule(job)
+            job['running'].release()
+
+    def _load_schedule(self):
+        """Próximas ejecuciones guardadas por el líder anterior ({nombre: epoch})"""
+        try:
+            with app.app_context():
+                with db.engine.connect() as conn:
+                    return dict(conn.execute(db.select(SchedulerJob.name, SchedulerJob.next_run_at)).all())
+        except Exception as e:
+            print(f"⚠️  SCHEDULER: No se pudo leer el calendario de tareas: {e}")
+            return {}
+
+    def _save_schedule(self, job):
+        next_run_at = time.time() + max(job['next_run'] - time.monotonic(), 0)
+        try:
+            with app.app_context():
+                with db.engine.begin() as conn:
+                    result = conn.execute(
+                        update(SchedulerJob).where(SchedulerJob.name == job['name']).values(next_run_at=next_run_at)
+                    )
+                    if result.rowcount == 0:
+                        conn.execute(insert(SchedulerJob).values(name=job['name'], next_run_at=next_run_at))
+        except Exception as e:
+            print(f"⚠️  SCHEDULER: No se pudo guardar la próxima ejecución de '{job['name']}': {e}")
+
+def check_saved_drive_links():
+    """Revisa los enlaces de Drive guardados y registra los que dejaron de ser accesibles"""
+    planillas = db.session.query(Planilla.año, Planilla.mes, Planilla.url_google_drive).all()
+    statuses = validate_drive_links([url for _, _, url in planillas])
+    # Los fallos de red no indican que el enlace esté roto; solo se informan
+    broken = [(year, mes, statuses[url]) for year, mes, url in planillas if statuses[url] in ('private', 'not_found', 'invalid')]
+    unreachable = sum(1 for _, _, url in planillas if statuses[url] in ('timeout', 'error'))
+    print(f"🔗 DRIVE-SYNC: {len(planillas) - len(broken) - unreachable} enlaces válidos, {len(broken)} con problemas, {unreachable} sin respuesta")
+    if broken:
+        detalle = ', '.join(f'{mes}/{year} ({status})' for year, mes, status in broken[:20])
+        log_activity('drive_links_check', details=f'{len(broken)} enlaces con problemas: {detalle}')
+
+background_scheduler = BackgroundScheduler(LeaderLock(SCHEDULER_LOCK_FILE, SCHEDULER_LOCK_ID), SCHEDULER_RETRY_INTERVAL)
+background_scheduler.add_job('expiry_sync', lambda: expiry_scheduler.request_resync(), EXPIRY_SYNC_INTERVAL, jitter=10)
+background_scheduler.add_job('drive_sync', check_saved_drive_links, DRIVE_SYNC_INTERVAL, jitter=300)
+# post_worker_init ya calienta el worker al arrancar: la primera pasada espera un intervalo
+background_scheduler.add_job('warm_up', warm_up, WARM_UP_INTERVAL, jitter=5, leader_only=False, delay_first=True)
+if KEEP_ALIVE_ENABLED:
+    background_scheduler.add_job('keep_alive', keep_alive_ping, KEEP_ALIVE_INTERVAL, jitter=30)
+
+@background_scheduler.on_leader
+def _start_leader_threads():
+    expiry_scheduler.start()
+
+def start_background_jobs():
+    """Arranca el planificador de tareas de fondo en este proceso.
+    
+    Se llama desde el hook post_worker_init de Gunicorn (ver gunicorn.conf.py) y
+    desde el servidor de desarrollo. Los usuarios temporales solo los vence el líder;
+    el calentamiento corre en todos los procesos.
+    """
+    expiry_scheduler.autostart = False
+    background_scheduler.start()
 
 @app.route('/cron/ejecutar-tarea')
 def cron_ejecutar_tarea():
@@ -1795,33 +4370,126 @@ def cron_ejecutar_tarea():
     except Exception as e:
         return f'Error al ejecutar la tarea: {str(e)}', 500
 
+# === SONDAS DE SALUD: LIVENESS Y READINESS ===
+# /livez responde sin tocar la base de datos (el proceso está vivo). /readyz
+# devuelve el último resultado de una sonda que corre en segundo plano en cada
+# proceso (READINESS_PROBE_INTERVAL): los monitores externos, el keep-alive y
+# Render ya no generan consultas. Si la sonda no ha corrido o su resultado es
+# viejo (por ejemplo, sin planificador en desarrollo), se recalcula en la petición.
+# La sonda solo lee table_version (una consulta mínima, como un SELECT 1); los
+# conteos de usuarios se recalculan cuando cambia la tabla user o vence un
+# usuario temporal, no en cada pasada.
+READINESS_PROBE_INTERVAL = int(os.environ.get('READINESS_PROBE_INTERVAL', 15))
+READINESS_MAX_AGE = 3 * READINESS_PROBE_INTERVAL
+PROCESS_STARTED = time.time()
+
+_readiness = {'result': None, 'checked': 0.0}
+_readiness_lock = threading.Lock()
+_user_counts = {'version': None, 'valid_until': None, 'data': None}
+
+def get_user_counts(version):
+    """Conteos de usuarios para /health y /status, cacheados por versión de la tabla user"""
+    now = to_naive_utc(datetime.now(timezone.utc))
+    cached = _user_counts
+    hit = cached['version'] == version and (cached['valid_until'] is None or now < cached['valid_until'])
+    count_cache('user_counts', hit)
+    if hit:
+        return cached['data']
+    temporary = db.and_(User.is_temporary == True, User.expires_at > now)
+    row = db.session.execute(db.select(
+        db.select(func.count(User.id)).scalar_subquery().label('total_users'),
+        db.select(func.count(User.id)).where(User.is_temporary == False).scalar_subquery().label('active_users'),
+        db.select(func.count(User.id)).where(temporary).scalar_subquery().label('active_temporary_users'),
+        db.select(func.min(User.expires_at)).where(temporary).scalar_subquery().label('next_expiry')
+    )).one()
+    data = dict(row._mapping)
+    # El conteo de temporales activos cambia al vencer el próximo, aunque la tabla no cambie
+    _user_counts.update(version=version, valid_until=data.pop('next_expiry'), data=data)
+    return data
+
+def run_readiness_probe():
+    """Comprueba la base de datos y el planificador y guarda el resultado"""
+    started = time.perf_counter()
+    checks = {}
+    stats = {}
+    try:
+        # Si la lectura de versiones responde, la base de datos está disponible
+        version = get_version('user')
+        checks['database'] = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+        stats = get_user_counts(version)
+    except Exception as e:
+        db.session.rollback()
+        checks['database'] = {'ok': False, 'error': str(e)}
+    
+    # El planificador es informativo: sus fallos no sacan al proceso del balanceador
+    scheduler = background_scheduler.status()
+    checks['scheduler'] = {
+        'ok': True,
+        'running': scheduler['running'],
+        'leader': scheduler['leader'],
+        'failing_jobs': [name for name, job in scheduler['jobs'].items() if job['last_error']]
+    }
+    
+    ready = checks['database']['ok']
+    _readiness['result'] = {
+        'status': 'ready' if ready else 'not_ready',
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+        'probe_ms': round((time.perf_counter() - started) * 1000, 1),
+        'pid': os.getpid(),
+        'checks': checks,
+        'stats': stats
+    }
+    _readiness['checked'] = time.monotonic()
+    if not ready:
+        print(f"🩺 READINESS: Proceso {os.getpid()} no está listo: {checks['database']['error']}")
+
+def get_readiness():
+    """Último resultado de la sonda de readiness (se recalcula si falta o es viejo)"""
+    if _readiness['result'] is None or time.monotonic() - _readiness['checked'] > READINESS_MAX_AGE:
+        with _readiness_lock:
+            if _readiness['result'] is None or time.monotonic() - _readiness['checked'] > READINESS_MAX_AGE:
+                run_readiness_probe()
+    return _readiness['result']
+
+background_scheduler.add_job('readiness_probe', run_readiness_probe, READINESS_PROBE_INTERVAL, jitter=2, leader_only=False)
+
+@app.route('/livez')
+def liveness():
+    """Liveness: el proceso responde; nunca consulta la base de datos"""
+    return jsonify({
+        'status': 'alive',
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - PROCESS_STARTED)
+    }), 200
+
+@app.route('/readyz')
+def readiness():
+    """Readiness: resultado cacheado de la sonda en segundo plano"""
+    result = get_readiness()
+    return jsonify(result), 200 if result['status'] == 'ready' else 503
+
 # === RUTA DE HEALTH CHECK ===
 @app.route('/health')
 def health_check():
-    """Endpoint de health check para monitoreo externo"""
-    try:
-        # Verificar conexión a base de datos
-        db.session.execute(text('SELECT 1'))
-        
-        # Verificar usuarios activos
-        active_users = User.query.filter(
-            User.is_temporary == False
-        ).count()
-        
-        return jsonify({
-            'status': 'healthy',
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'database': 'connected',
-            'active_users': active_users,
-            'uptime': 'running'
-        }), 200
-        
-    except Exception as e:
+    """Endpoint de health check para monitoreo externo (usa la sonda de readiness)"""
+    result = get_readiness()
+    database = result['checks']['database']
+    if not database['ok']:
         return jsonify({
             'status': 'unhealthy',
             'timestamp': datetime.now(timezone.utc).isoformat(),
-            'error': str(e)
+            'checked_at': result['checked_at'],
+            'error': database['error']
         }), 500
+    
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'checked_at': result['checked_at'],
+        'database': 'connected',
+        'active_users': result['stats']['active_users'],
+        'uptime': 'running'
+    }), 200
 
 # === RUTA DE PING SIMPLE ===
 @app.route('/ping')
@@ -1836,40 +4504,74 @@ def ping():
 # === RUTA DE STATUS DETALLADO ===
 @app.route('/status')
 def status():
-    """Endpoint de status detallado para administradores"""
-    try:
-        # Estadísticas del sistema
-        total_users = User.query.count()
-        active_temporary_users = User.query.filter(
-            User.is_temporary == True,
-            User.expires_at > datetime.now(timezone.utc)
-        ).count()
-        
-        # Verificar keep-alive
-        keep_alive_status = "enabled" if KEEP_ALIVE_ENABLED else "disabled"
-        
-        return jsonify({
-            'status': 'operational',
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'system_stats': {
-                'total_users': total_users,
-                'active_temporary_users': active_temporary_users,
-                'keep_alive': keep_alive_status,
-                'keep_alive_interval': KEEP_ALIVE_INTERVAL
-            },
-            'environment': {
-                'render': bool(os.environ.get('RENDER')),
-                'port': os.environ.get('PORT', 5000),
-                'python_version': sys.version
-            }
-        }), 200
-        
-    except Exception as e:
+    """Endpoint de status detallado para administradores (sin consultas propias)"""
+    result = get_readiness()
+    if result['status'] != 'ready':
         return jsonify({
             'status': 'error',
             'timestamp': datetime.now(timezone.utc).isoformat(),
-            'error': str(e)
+            'error': result['checks']['database']['error']
         }), 500
+    
+    # Verificar keep-alive
+    keep_alive_status = "enabled" if KEEP_ALIVE_ENABLED else "disabled"
+    
+    return jsonify({
+        'status': 'operational',
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'checked_at': result['checked_at'],
+        'system_stats': {
+            'total_users': result['stats']['total_users'],
+            'active_temporary_users': result['stats']['active_temporary_users'],
+            'keep_alive': keep_alive_status,
+            'keep_alive_interval': KEEP_ALIVE_INTERVAL
+        },
+        'checks': result['checks'],
+        'environment': {
+            'render': bool(os.environ.get('RENDER')),
+            'port': os.environ.get('PORT', 5000),
+            'python_version': sys.version,
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - PROCESS_STARTED)
+        }
+    }), 200
+
+# === RUTA DE MÉTRICAS ===
+def scrape_gauges():
+    """Gauges que se leen en el momento de la consulta (pool de BD, cachés, proceso)"""
+    pid = (('pid', str(os.getpid())),)
+    gauges = [
+        ('process_uptime_seconds', 'Segundos desde que arrancó el proceso', [(pid, round(time.time() - PROCESS_STARTED))]),
+        ('scheduler_leader', '1 si este proceso ejecuta las tareas de fondo', [(pid, int(background_scheduler.is_leader))]),
+        ('page_cache_entries', 'Páginas HTML cacheadas en el proceso', [((), len(_page_cache))]),
+        ('user_cache_entries', 'Usuarios en la caché de identidad', [((), len(_user_cache))]),
+        ('password_hash_max_pending', 'Hashes simultáneos admitidos antes de responder 503', [((), PASSWORD_HASH_MAX_PENDING)])
+    ]
+    pool = db.engine.pool
+    # Solo QueuePool (PostgreSQL y SQLite en archivo) lleva la cuenta de conexiones
+    if hasattr(pool, 'checkedout'):
+        gauges.append(('db_pool_connections', 'Conexiones del pool de la base de datos por estado', [
+            ((('state', 'checked_out'),), pool.checkedout()),
+            ((('state', 'idle'),), pool.checkedin()),
+            ((('state', 'overflow'),), max(pool.overflow(), 0))
+        ]))
+        gauges.append(('db_pool_size', 'Tamaño configurado del pool de la base de datos', [((), pool.size())]))
+    return gauges
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    if METRICS_TOKEN:
+        supplied = request.args.get('token') or request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        # Se comparan bytes: compare_digest rechaza cadenas con caracteres no ASCII
+        if not secrets.compare_digest(supplied.encode('utf-8'), METRICS_TOKEN.encode('utf-8')):
+            return 'No autorizado', 403
+    elif not METRICS_PUBLIC:
+        return 'No autorizado: defina METRICS_TOKEN', 403
+    response = make_response(metrics.render(scrape_gauges()))
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 @app.route('/admin/important_message', methods=['GET', 'POST'])
 @login_required
@@ -1895,6 +4597,7 @@ def important_message_admin():
             msg = ImportantMessage(content=content, is_active=is_active)
             db.session.add(msg)
         db.session.commit()
+        log_activity('update_important_message', details=f'Activo: {is_active}')
         if request.is_json:
             return jsonify({'success': True, 'message': 'Mensaje actualizado correctamente.'})
         flash('Mensaje actualizado correctamente.', 'success')
@@ -1909,51 +4612,78 @@ def important_message_admin():
 
 @app.route('/get_important_message')
 def get_important_message():
+    etag = make_etag('important_message', get_version('important_message'))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
     msg = ImportantMessage.query.first()
     if msg and msg.is_active and msg.content.strip():
-        return jsonify({'active': True, 'content': msg.content})
-    return jsonify({'active': False})
+        return with_etag(jsonify({'active': True, 'content': msg.content}), etag)
+    return with_etag(jsonify({'active': False}), etag)
 
-if __name__ == '__main__':
-    import os
-    import threading
-    import time
-    import requests
+# === PUNTO DE ENTRADA E INFORME DE IMPORTACIÓN ===
+HEAVY_MODULES = ('pandas', 'numpy', 'docx', 'openpyxl', 'requests')
+IMPORT_TIME_MS = round((time.perf_counter() - _IMPORT_STARTED) * 1000)
 
-    with app.app_context():
-        init_db()
-        # Iniciar el hilo de limpieza en segundo plano
-        from threading import Thread
+def import_time_report():
+    """Tiempo que tardó en importarse app.py y dependencias pesadas ya cargadas"""
+    return {
+        'import_ms': IMPORT_TIME_MS,
+        'heavy_modules_loaded': [name for name in HEAVY_MODULES if name in sys.modules]
+    }
 
-        def background_cleanup():
-            while True:
-                cleanup_expired_users()
-                time.sleep(600)  # 10 minutos
-
-        cleanup_thread = Thread(target=background_cleanup)
-        cleanup_thread.daemon = True
-        cleanup_thread.start()
-
-        # --- Hilo keep-alive mejorado ---
-        def start_keep_alive():
-            if KEEP_ALIVE_ENABLED:
-                print("🚀 Iniciando sistema de keep-alive...")
-                keep_alive_improved()
-            else:
-                print("⏸️  Keep-alive deshabilitado por configuración")
+_create_app_lock = threading.Lock()
 
-        # Solo iniciar el keep-alive si estamos en Render o está habilitado
-        if (os.environ.get('RENDER') or 
-            os.environ.get('RENDER_EXTERNAL_URL') or 
-            os.environ.get('RENDER_EXTERNAL_HOSTNAME') or
-            KEEP_ALIVE_ENABLED):
-            
-            ka_thread = threading.Thread(target=start_keep_alive)
-            ka_thread.daemon = True
-            ka_thread.start()
-            print("✅ Hilo de keep-alive iniciado")
-        else:
-            print("ℹ️  Keep-alive no iniciado (no estamos en Render)")
+def create_app(config=None):
+    """Devuelve la aplicación configurada; es el punto de entrada de Gunicorn.
+    
+    Las rutas se registran al importar este módulo. La configuración adicional
+    (por ejemplo, una base de datos de pruebas) se aplica aquí, antes de enlazar
+    SQLAlchemy; las llamadas siguientes devuelven la misma aplicación.
+    """
+    with _create_app_lock:
+        if 'sqlalchemy' in app.extensions:
+            if config:
+                raise RuntimeError('create_app(config) debe llamarse antes de inicializar la base de datos')
+            return app
+        if config:
+            app.config.update(config)
+        _init_database()
+    return app
+
+def _init_database():
+    """Enlaza SQLAlchemy con la configuración actual de la aplicación"""
+    # Con workers de hilos (gthread) cada hilo toma su propia conexión del pool:
+    # el pool debe ser al menos tan grande como GUNICORN_THREADS
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', os.environ.get('GUNICORN_THREADS', 8))),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 4)),
+            'pool_pre_ping': True,
+            'pool_recycle': 1800
+        })
+    db.init_app(app)
+
+@appcontext_pushed.connect_via(app)
+def _bind_default_database(sender, **extra):
+    """Quien use 'app' sin pasar por create_app() (gunicorn app:app, flask --app app,
+    scripts) obtiene la base de datos de la configuración por defecto"""
+    if 'sqlalchemy' not in app.extensions:
+        create_app()
+
+_report = import_time_report()
+print(f"⏱️  IMPORT: app.py cargado en {_report['import_ms']} ms "
+      f"(dependencias pesadas cargadas: {', '.join(_report['heavy_modules_loaded']) or 'ninguna'})")
+
+if __name__ == '__main__':
+    create_app()
+    with app.app_context():
+        init_db()
+        warm_up()
+    
+    # Vencimiento de usuarios temporales, keep-alive y revisión de enlaces de Drive
+    start_background_jobs()
 
     port = int(os.environ.get('PORT', 5000))
     # Solo usar debug en desarrollo local, no en producción
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concurrencia: lanza peticiones en paralelo contra la aplicación y
+reporta throughput y latencias (p50/p95/p99). Sirve para comparar los tipos de
+worker de Gunicorn (sync, gthread, gevent).
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+def percentile(values, pct):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de concurrencia de la aplicación')
+    parser.add_argument('url', help='URL base, p. ej. http://127.0.0.1:5000')
+    parser.add_argument('--path', default='/dashboard', help='ruta a consultar (GET)')
+    parser.add_argument('--login', action='store_true', help='medir POST /login en lugar de --path')
+    parser.add_argument('--user', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    credentials = {'username': args.user, 'password': args.password}
+    local = threading.local()
+
+    def get_session():
+        http = getattr(local, 'session', None)
+        if http is None:
+            http = local.session = requests.Session()
+            if not args.login:
+                http.post(f'{base_url}/login', data=credentials, timeout=60)
+        return http
+
+    def one_request(_):
+        http = get_session()
+        start = time.perf_counter()
+        if args.login:
+            response = http.post(f'{base_url}/login', data=credentials, allow_redirects=False, timeout=60)
+        else:
+            response = http.get(f'{base_url}{args.path}', allow_redirects=False, timeout=60)
+        return time.perf_counter() - start, response.status_code
+
+    target = 'POST /login' if args.login else f'GET {args.path}'
+    print(f"🚀 {target} x {args.requests} con concurrencia {args.concurrency}")
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        # Calentar las sesiones antes de medir
+        list(pool.map(lambda _: get_session(), range(args.concurrency)))
+        started = time.perf_counter()
+        results = list(pool.map(one_request, range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    print(f"⏱️  Tiempo total: {elapsed:.2f}s")
+    print(f"📈 Throughput: {len(results) / elapsed:.1f} req/s")
+    print(f"📊 Latencia ms: media {statistics.mean(latencies):.1f} | "
+          f"p50 {percentile(latencies, 50):.1f} | p95 {percentile(latencies, 95):.1f} | "
+          f"p99 {percentile(latencies, 99):.1f}")
+    if errors:
+        print(f"⚠️  Respuestas con error: {errors}")
+
+if __name__ == "__main__":
+    main()
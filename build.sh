@@ -4,6 +4,9 @@ echo "🚀 Iniciando construcción de la aplicación..."
 # Instalar dependencias
 pip install -r requirements.txt
 
+# Compilar las plantillas Jinja y guardar su bytecode (JINJA_CACHE_DIR, por defecto .jinja_cache)
+python -c "from app import precompile_templates; print(f'🧩 {precompile_templates()} plantillas compiladas')"
+
 # Configurar variables de entorno para keep-alive
 export KEEP_ALIVE_ENABLED=true
 export KEEP_ALIVE_INTERVAL=300
@@ -0,0 +1,35 @@
+"""
+Configuración de pytest para las pruebas de la lógica de app.py
+"""
+
+import os
+
+import pytest
+
+# test_keep_alive.py es un script contra una URL real, no una prueba de pytest
+collect_ignore = ['test_keep_alive.py']
+
+# Antes de importar app: hashes en línea y sin tareas de red
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('KEEP_ALIVE_ENABLED', 'false')
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """Aplicación con una base de datos SQLite temporal e inicializada"""
+    import app as app_module
+    db_path = tmp_path_factory.mktemp('db') / 'test.db'
+    application = app_module.create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'TESTING': True
+    })
+    app_module.init_db()
+    return application
+
+
+@pytest.fixture
+def admin_client(app):
+    """Cliente con sesión iniciada como el administrador por defecto"""
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
@@ -0,0 +1,64 @@
+# Configuración de Gunicorn
+# Por defecto se usa el worker 'gthread': cada proceso atiende varias peticiones
+# en hilos, así una exportación a Google o un hash de contraseña no bloquea al
+# resto de usuarios. Todos los valores se pueden ajustar con variables de entorno.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+wsgi_app = 'app:create_app()'
+
+# sync | gthread | gevent (gevent requiere 'pip install gevent')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+# Con el worker sync Gunicorn cambia a gthread si threads > 1
+if worker_class == 'sync':
+    threads = 1
+# gthread propio: al reciclarse por max_requests no corta conexiones ya aceptadas
+elif worker_class == 'gthread':
+    worker_class = 'gunicorn_workers.GracefulThreadWorker'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+max_requests = 1000
+max_requests_jitter = 100
+
+# La app se carga en el maestro y los workers la heredan ya caliente (copy-on-write)
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def on_starting(server):
+    """Prepara la base de datos una sola vez, en el proceso maestro"""
+    from app import create_app, db, init_db
+    app = create_app()
+    with app.app_context():
+        init_db()
+        # Los workers no deben heredar conexiones abiertas del maestro
+        db.engine.dispose()
+
+
+def when_ready(server):
+    """Calienta el maestro antes de crear los workers (plantillas, imágenes, páginas)"""
+    from app import create_app, prefork_warm_up
+    create_app()
+    prefork_warm_up()
+
+
+def post_fork(server, worker):
+    """Descarta lo heredado del maestro que no se puede compartir"""
+    from app import reset_after_fork
+    reset_after_fork()
+
+
+def post_worker_init(worker):
+    """Cada worker recarga sus cachés y arranca el planificador; solo el líder ejecuta las tareas"""
+    from app import create_app, start_background_jobs, warm_up
+    app = create_app()
+    try:
+        with app.app_context():
+            warm_up()
+    except Exception as e:
+        print(f"⚠️  WARM-UP: Error al calentar el worker: {e}")
+    start_background_jobs()
@@ -0,0 +1,61 @@
+"""
+Workers personalizados de Gunicorn.
+
+El worker 'gthread' de Gunicorn, al llegar a max_requests, sale del bucle
+principal con conexiones ya aceptadas y todavía sin atender: el cliente recibe
+una conexión cortada en cada reciclaje. GracefulThreadWorker deja primero de
+aceptar conexiones (las atiende otro worker o el que lo reemplaza), termina las
+que ya tiene y solo entonces sale.
+"""
+
+import sys
+import time
+
+from gunicorn.workers.gthread import ThreadWorker
+
+# Segundos que una conexión keep-alive inactiva puede seguir abierta mientras el worker se recicla
+RETIRE_GRACE = 1.0
+
+
+class GracefulThreadWorker(ThreadWorker):
+    """Worker gthread que se recicla sin cortar conexiones"""
+
+    def init_process(self):
+        # Gunicorn ya sumó el jitter a max_requests; el reciclaje lo gestionamos aquí
+        self.retire_after = self.max_requests
+        self.max_requests = sys.maxsize
+        self.retiring = False
+        self.listeners_closed = False
+        super().init_process()
+
+    def accept(self, server, listener):
+        # Mientras se recicla, la conexión queda en la cola del socket para otro worker
+        if self.retiring:
+            return
+        super().accept(server, listener)
+
+    def handle_request(self, req, conn):
+        if self.nr + 1 >= self.retire_after and not self.retiring:
+            self.log.info("Reciclando worker: no acepta nuevas conexiones y termina las pendientes.")
+            self.retiring = True
+            # Sin hueco para keep-alive: las respuestas salen con 'Connection: close'
+            self.max_keepalived = 0
+        return super().handle_request(req, conn)
+
+    def murder_keepalived(self):
+        # Se ejecuta en el hilo principal en cada vuelta del bucle de run()
+        if self.retiring:
+            with self._lock:
+                if not self.listeners_closed:
+                    for sock in self.sockets:
+                        self.poller.unregister(sock)
+                    self.listeners_closed = True
+                    # Las conexiones keep-alive inactivas tienen un margen corto para
+                    # enviar su siguiente petición (se responde con 'Connection: close');
+                    # cerrarlas de inmediato cortaría las que ya venían en camino
+                    deadline = time.time() + RETIRE_GRACE
+                    for conn in self._keep:
+                        conn.timeout = min(conn.timeout, deadline)
+        super().murder_keepalived()
+        if self.retiring and self.nr_conns == 0:
+            self.alive = False
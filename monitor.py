@@ -13,8 +13,8 @@ from datetime import datetime
 def ping_app(url):
     """Hace ping a la aplicación y verifica su estado"""
     try:
-        # Intentar health check primero
-        health_url = f"{url}/health"
+        # Readiness: resultado cacheado de la sonda, no consulta la BD
+        health_url = f"{url}/readyz"
         response = requests.get(health_url, timeout=10)
         
         if response.status_code == 200:
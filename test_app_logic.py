@@ -0,0 +1,299 @@
+"""
+Pruebas de la lógica pura de app.py (se ejecutan con: python -m pytest -q)
+"""
+
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app import (ActivityLog, DatabaseRateLimitBackend, Planilla, MemoryRateLimitBackend, _estimate, _sliding_window,
+                 activity_page, balance_assignments, db, decode_activity_cursor, encode_activity_cursor,
+                 expand_schedule, parse_bool, parse_id, password_needs_rehash)
+
+
+# === CURSOR DEL HISTORIAL DE ACTIVIDAD ===
+def test_activity_cursor_round_trip():
+    activity = SimpleNamespace(id=42, created_at=datetime(2026, 3, 5, 14, 30, 15, 123456))
+    assert decode_activity_cursor(encode_activity_cursor(activity)) == (activity.created_at, 42)
+
+
+def test_activity_cursor_without_created_at():
+    activity = SimpleNamespace(id=7, created_at=None)
+    assert decode_activity_cursor(encode_activity_cursor(activity)) == (None, 7)
+
+
+def test_activity_page_walks_dated_then_undated_rows(app):
+    with app.app_context():
+        db.session.execute(db.delete(ActivityLog))
+        # Dos filas con la misma fecha (desempata el id) y tres sin fecha; el valor por
+        # defecto de created_at se aplica al insertar, así que se vacía después
+        dates = [datetime(2026, 1, 1, 10, minute) for minute in (1, 2, 2, 3)]
+        db.session.execute(insert(ActivityLog), [{'action': 'test', 'created_at': value} for value in dates])
+        db.session.execute(insert(ActivityLog), [{'action': 'test', 'details': 'sin fecha'}] * 3)
+        db.session.execute(db.update(ActivityLog).where(ActivityLog.details == 'sin fecha').values(created_at=None))
+        db.session.commit()
+        assert ActivityLog.query.filter(ActivityLog.created_at.is_(None)).count() == 3
+        expected = [row.id for row in ActivityLog.query.order_by(
+            ActivityLog.created_at.is_(None), ActivityLog.created_at.desc(), ActivityLog.id.desc()
+        )]
+        
+        seen, cursor = [], None
+        while True:
+            rows = activity_page(ActivityLog.query, cursor, 2)
+            seen += [row.id for row in rows[:2]]
+            if len(rows) <= 2:
+                break
+            cursor = decode_activity_cursor(encode_activity_cursor(rows[1]))
+        assert seen == expected
+
+
+# === IDS Y BOOLEANOS RECIBIDOS EN JSON ===
+@pytest.mark.parametrize('value, expected', [
+    (3, 3), ('3', 3), (' 12 ', 12), ('x', None), ('-1', None), ('1.5', None),
+    (True, None), ([1], None), ({'id': 1}, None), (None, None)
+])
+def test_parse_id(value, expected):
+    assert parse_id(value) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, True), (False, False), (1, True), (0, False), ('false', False), ('True', True),
+    ('sí', True), ('off', False), ('', False)
+])
+def test_parse_bool(value, expected):
+    assert parse_bool(value) is expected
+
+
+def test_parse_bool_default_and_invalid():
+    assert parse_bool(None, default=True) is True
+    with pytest.raises(ValueError):
+        parse_bool('quizás')
+
+
+def test_create_tasks_batch_reports_invalid_assignees_per_item(admin_client):
+    response = admin_client.post('/api/tasks/batch', json={'tasks': [
+        {'title': 'Lista', 'assigned_to': [1]},
+        {'title': 'Texto', 'assigned_to': '1'},
+        {'title': 'Inexistente', 'assigned_to': 99999},
+        {'title': 'Sin asignar'}
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['success'] for result in results] == [False, True, False, True]
+    assert results[0]['error'] == 'Usuario asignado no válido'
+
+
+# === PROGRAMACIÓN RECURRENTE ===
+_rule_ids = iter(range(1, 10000))
+
+
+def make_rule(frequency, start_date, interval=1, weekdays=None, weekday=None, nth=None, end_date=None):
+    # Cada regla lleva su propio id para no compartir la caché de expansiones
+    return SimpleNamespace(id=next(_rule_ids), version=1, frequency=frequency, interval=interval,
+                           weekdays=weekdays, weekday=weekday, nth=nth,
+                           start_date=start_date, end_date=end_date)
+
+
+def brute_force(start, end, predicate):
+    days = []
+    day = start
+    while day < end:
+        if predicate(day):
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def test_expand_daily_with_interval_counts_from_start_date():
+    rule = make_rule('daily', date(2026, 1, 3), interval=3)
+    assert list(expand_schedule(rule, date(2026, 1, 1), date(2026, 1, 13))) == [
+        date(2026, 1, 3), date(2026, 1, 6), date(2026, 1, 9), date(2026, 1, 12)
+    ]
+
+
+def test_expand_weekly_every_other_week():
+    # Lunes y jueves, cada dos semanas a partir de la semana del miércoles 7 de enero
+    rule = make_rule('weekly', date(2026, 1, 7), interval=2, weekdays='0,3')
+    start, end = date(2026, 1, 1), date(2026, 3, 1)
+    week_origin = date(2026, 1, 5)
+    expected = brute_force(start, end, lambda day: day >= rule.start_date and day.weekday() in (0, 3)
+                           and ((day - week_origin).days // 7) % 2 == 0)
+    assert list(expand_schedule(rule, start, end)) == expected
+    assert expected[0] == date(2026, 1, 8)
+
+
+def test_expand_monthly_last_weekday():
+    # Último viernes de cada mes, incluidos meses con cinco viernes
+    rule = make_rule('monthly', date(2026, 1, 1), weekday=4, nth=-1)
+    start, end = date(2026, 1, 1), date(2027, 1, 1)
+    expected = brute_force(start, end, lambda day: day.weekday() == 4 and (day + timedelta(days=7)).month != day.month)
+    assert list(expand_schedule(rule, start, end)) == expected
+    assert date(2026, 1, 30) in expected and date(2026, 5, 29) in expected
+
+
+def test_expand_monthly_nth_weekday_every_two_months():
+    # Segundo martes, cada dos meses desde enero
+    rule = make_rule('monthly', date(2026, 1, 1), interval=2, weekday=1, nth=2)
+    assert list(expand_schedule(rule, date(2026, 1, 1), date(2026, 7, 1))) == [
+        date(2026, 1, 13), date(2026, 3, 10), date(2026, 5, 12)
+    ]
+
+
+def test_expand_respects_end_date_inclusive():
+    rule = make_rule('daily', date(2026, 1, 1), end_date=date(2026, 1, 3))
+    assert list(expand_schedule(rule, date(2026, 1, 1), date(2026, 2, 1))) == [
+        date(2026, 1, 1), date(2026, 1, 2), date(2026, 1, 3)
+    ]
+    assert list(expand_schedule(rule, date(2026, 2, 1), date(2026, 3, 1))) == []
+
+
+@pytest.mark.parametrize('body', [[], [{'area': 'Baños'}], {'area': 'Baños', 'title': 'Aseo', 'frequency': 'daily',
+                                                             'start_date': '2026-01-01', 'interval': 'x'}])
+def test_create_schedule_rejects_invalid_bodies(admin_client, body):
+    assert admin_client.post('/api/schedules', json=body).status_code == 400
+
+
+# === ASIGNACIÓN BALANCEADA DE TAREAS ===
+def test_balance_assignments_evens_out_each_day():
+    day = datetime(2026, 2, 2, 9)
+    tasks = [(task_id, day) for task_id in range(1, 7)]
+    assignments = balance_assignments(tasks, {10: None, 20: None, 30: None}, {}, {})
+    per_user = {}
+    for _, user_id in assignments:
+        per_user[user_id] = per_user.get(user_id, 0) + 1
+    assert per_user == {10: 2, 20: 2, 30: 2}
+
+
+def test_balance_assignments_prefers_lighter_day_then_lighter_total():
+    day = datetime(2026, 2, 2, 9)
+    # 10 ya tiene una tarea ese día; 20 y 30 empatan en el día y 30 tiene menos en total
+    load = {10: 1, 20: 5, 30: 2}
+    day_load = {(10, '2026-02-02'): 1}
+    assert balance_assignments([(1, day)], {10: None, 20: None, 30: None}, load, day_load) == [(1, 30)]
+
+
+def test_balance_assignments_skips_expired_temporary_users():
+    crew = {10: datetime(2026, 2, 2, 8), 20: None}
+    tasks = [(1, datetime(2026, 2, 2, 9)), (2, datetime(2026, 2, 2, 7))]
+    assert dict(balance_assignments(tasks, crew, {20: 10}, {})) == {1: 20, 2: 10}
+
+
+def test_balance_assignments_without_available_crew():
+    crew = {10: datetime(2026, 1, 1)}
+    assert balance_assignments([(1, datetime(2026, 2, 2))], crew, {}, {}) == [(1, None)]
+    assert balance_assignments([(1, None)], {}, {}, {}) == [(1, None)]
+
+
+# === LIMITADOR DE INTENTOS ===
+WINDOW = 300
+
+
+def test_sliding_window_rolls_counts_forward():
+    now = 10 * WINDOW + 30
+    assert _sliding_window(None, now, WINDOW) == (10, 0, 0)
+    assert _sliding_window((10, 4, 2), now, WINDOW) == (10, 4, 2)
+    # La ventana actual pasa a ser la anterior
+    assert _sliding_window((9, 4, 2), now, WINDOW) == (10, 0, 4)
+    # Dos ventanas o más sin actividad: se empieza de cero
+    assert _sliding_window((8, 4, 2), now, WINDOW) == (10, 0, 0)
+
+
+def test_estimate_weights_previous_window_by_remaining_time():
+    assert _estimate(0, 10, 10 * WINDOW, WINDOW) == 10
+    assert _estimate(2, 10, 10 * WINDOW + WINDOW / 2, WINDOW) == 7
+    assert _estimate(3, 10, 11 * WINDOW - 1e-9, WINDOW) == pytest.approx(3)
+
+
+@pytest.mark.parametrize('backend_class', [MemoryRateLimitBackend, DatabaseRateLimitBackend])
+def test_rate_limit_backends_block_after_limit(app, backend_class):
+    backend = backend_class()
+    key = f'test:{backend_class.__name__}'
+    with app.app_context():
+        backend.reset(key)
+        results = [backend.hit(key, 3, WINDOW) for _ in range(5)]
+        assert [allowed for allowed, _ in results] == [True, True, True, False, False]
+        assert 0 < results[-1][1] <= WINDOW + 1
+        backend.reset(key)
+        assert backend.hit(key, 3, WINDOW)[0]
+
+
+def test_login_lockout_is_per_user_and_ip(app, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'rate_limiter', MemoryRateLimitBackend())
+    monkeypatch.setattr(app_module, 'LOGIN_RATE_LIMIT_PER_USER', 2)
+    client = app.test_client()
+    attempt = {'username': 'x' * 500, 'password': 'incorrecta'}
+    statuses = [client.post('/login', data=attempt, environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code
+                for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert client.post('/login', data=attempt, environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+
+# === ACTUALIZACIÓN DE HASHES DE CONTRASEÑA ===
+@pytest.fixture
+def hash_settings(monkeypatch):
+    import app as app_module
+
+    def configure(method, salt_length=16):
+        monkeypatch.setattr(app_module, 'PASSWORD_HASH_METHOD', method)
+        monkeypatch.setattr(app_module, 'PASSWORD_HASH_SALT_LENGTH', salt_length)
+        monkeypatch.setattr(app_module, '_current_hash_params', None)
+    return configure
+
+
+def test_password_needs_rehash_compares_full_method(hash_settings):
+    hash_settings('pbkdf2:sha256:600000')
+    assert not password_needs_rehash(generate_password_hash('clave', 'pbkdf2:sha256:600000'))
+    # Solo cambia el número de iteraciones
+    assert password_needs_rehash(generate_password_hash('clave', 'pbkdf2:sha256:260000'))
+    assert password_needs_rehash(generate_password_hash('clave', 'scrypt'))
+
+
+def test_password_needs_rehash_detects_salt_length(hash_settings):
+    hash_settings('pbkdf2:sha256:600000', salt_length=16)
+    assert password_needs_rehash(generate_password_hash('clave', 'pbkdf2:sha256:600000', 8))
+
+
+def test_password_needs_rehash_with_short_method_name(hash_settings):
+    # 'pbkdf2' se guarda como 'pbkdf2:sha256:<iteraciones por defecto>'
+    hash_settings('pbkdf2')
+    assert not password_needs_rehash(generate_password_hash('clave', 'pbkdf2'))
+
+
+def test_password_needs_rehash_with_malformed_hash(hash_settings):
+    hash_settings('pbkdf2:sha256:600000')
+    assert password_needs_rehash('texto-plano')
+
+
+# === DISPONIBILIDAD DE PLANILLAS ===
+def add_planilla(mes, año, titulo, descripcion=None):
+    db.session.add(Planilla(mes=mes, año=año, titulo=titulo, descripcion=descripcion,
+                            url_google_drive='https://drive.google.com/file/d/prueba/view'))
+    db.session.commit()
+
+
+def test_planilla_availability_matrix_and_invalidation(app, admin_client):
+    with app.app_context():
+        add_planilla(1, 2031, 'Planilla de Control - Salud Casanare - Enero 2031')
+        add_planilla(2, 2031, 'Planilla de Control - Laboratorio - Febrero 2031')
+        # Título sin servicio: se clasifica por la descripción
+        add_planilla(3, 2031, 'Planilla Marzo', descripcion='Servicios de aseo del laboratorio')
+        # Mes fuera de rango: se ignora
+        add_planilla(13, 2031, 'Planilla de Control - Salud Casanare - ???')
+    
+    response = admin_client.get('/api/planillas/availability')
+    months = response.get_json()['years']['2031']
+    assert [index + 1 for index, present in enumerate(months['salud']) if present] == [1]
+    assert [index + 1 for index, present in enumerate(months['laboratorio']) if present] == [2, 3]
+    
+    etag = response.headers['ETag']
+    assert admin_client.get('/api/planillas/availability', headers={'If-None-Match': etag}).status_code == 304
+    
+    with app.app_context():
+        add_planilla(4, 2031, 'Planilla de Control - Salud Casanare - Abril 2031')
+    response = admin_client.get('/api/planillas/availability', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['years']['2031']['salud'][3] is True
@@ -11,6 +11,8 @@ def test_endpoints(app_url):
     """Prueba todos los endpoints de monitoreo"""
     endpoints = [
         ('/ping', 'Ping simple'),
+        ('/livez', 'Liveness'),
+        ('/readyz', 'Readiness'),
         ('/health', 'Health check'),
         ('/status', 'Status detallado'),
         ('/', 'Página principal')